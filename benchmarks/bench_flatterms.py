@@ -0,0 +1,77 @@
+"""Compare the memory used by interned term objects with that of the flat
+representation in `flatterms`, and measure conversions and bulk operations.
+
+    python benchmarks/bench_flatterms.py
+"""
+
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import flatterms
+import terms
+
+def randomTerm(random, depth):
+    if depth == 0 or random.random() < 0.1:
+        if random.random() < 0.3:
+            return terms.Variable(random.choice("xyzw"))
+        return terms.Application("c%d" % random.randrange(100))
+    if random.random() < 0.3:
+        return terms.Application("f%d" % random.randrange(20), randomTerm(random, depth - 1))
+    return terms.Application("g%d" % random.randrange(20), randomTerm(random, depth - 1), randomTerm(random, depth - 1))
+
+def allocated(build):
+    """Return the result of `build` and the number of bytes it keeps allocated."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+def main():
+    count = 20000
+    objects, objectBytes = allocated(lambda: [randomTerm(random.Random(i), 8) for i in range(count)])
+    nodes = sum(len(flatterms.FlatTerm.fromTerm(term)) for term in objects)
+
+    _, flatBytes = allocated(lambda: storeOf(objects))
+
+    start = time.perf_counter()
+    store = storeOf(objects)
+    appendSeconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for index in range(len(store)):
+        store[index].toTerm()
+    toTermSeconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    counts = store.countSymbols()
+    countSeconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    occurrences = sum(1 for _ in store.findSymbol("f0"))
+    findSeconds = time.perf_counter() - start
+
+    print("%d terms, %d nodes" % (count, nodes))
+    print("term objects:  %10d bytes (%.1f per node)" % (objectBytes, objectBytes / nodes))
+    print("flat store:    %10d bytes (%.1f per node), %.1fx less" % (flatBytes, flatBytes / nodes, objectBytes / flatBytes))
+    print("append:        %10.4f s" % appendSeconds)
+    print("toTerm:        %10.4f s" % toTermSeconds)
+    print("countSymbols:  %10.4f s (%d symbols)" % (countSeconds, len(counts)))
+    print("findSymbol:    %10.4f s (%d occurrences)" % (findSeconds, occurrences))
+
+def storeOf(objects):
+    store = flatterms.FlatTermStore()
+    for term in objects:
+        store.append(term)
+    return store
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Compare the parse throughput of `Parser` with the recursive reference parser.
+
+    python benchmarks/bench_parser.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import equationparser
+
+def balanced(depth):
+    if depth == 0:
+        return ":x"
+    sub = balanced(depth - 1)
+    return "*(%s, -1(%s))" % (sub, sub)
+
+def chain(depth):
+    return "s(" * depth + "0" + ")" * depth
+
+def flat(width):
+    return "f(%s)" % ", ".join("g(:x%d, c%d)" % (i, i) for i in range(width))
+
+def measure(parserClass, src, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parserClass(src).parseTerm()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    inputs = [
+        ("flat 10000", flat(10000)),
+        ("balanced 12", balanced(12)),
+        ("chain 300", chain(300)),
+        ("chain 100000", chain(100000)),
+    ]
+    
+    print("%-14s %10s %14s %14s" % ("input", "bytes", "Parser MB/s", "Recursive MB/s"))
+    for name, src in inputs:
+        megabytes = len(src) / 1e6
+        iterative = "%.2f" % (megabytes / measure(equationparser.Parser, src))
+        try:
+            recursive = "%.2f" % (megabytes / measure(equationparser.RecursiveParser, src))
+        except RecursionError:
+            recursive = "RecursionError"
+        
+        print("%-14s %10d %14s %14s" % (name, len(src), iterative, recursive))
+
+if __name__ == '__main__':
+    main()
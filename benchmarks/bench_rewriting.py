@@ -0,0 +1,80 @@
+"""Measure normalization with `rewriting.RewriteSystem` on the complete rewrite
+system for groups and on Peano arithmetic, with a cold and with a warm cache.
+
+    python benchmarks/bench_rewriting.py
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import equationparser
+import rewriting
+import terms
+
+def parse(src):
+    return equationparser.Parser(src).parseTerm()
+
+groupRules = [
+    ("*(e, :x)", ":x"),
+    ("*(i(:x), :x)", "e"),
+    ("*(*(:x, :y), :z)", "*(:x, *(:y, :z))"),
+    ("*(i(:x), *(:x, :y))", ":y"),
+    ("*(:x, e)", ":x"),
+    ("i(e)", "e"),
+    ("i(i(:x))", ":x"),
+    ("*(:x, i(:x))", "e"),
+    ("*(:x, *(i(:x), :y))", ":y"),
+    ("i(*(:x, :y))", "*(i(:y), i(:x))"),
+]
+
+arithmeticRules = [
+    ("+(0, :y)", ":y"),
+    ("+(s(:x), :y)", "s(+(:x, :y))"),
+    ("*(0, :y)", "0"),
+    ("*(s(:x), :y)", "+(:y, *(:x, :y))"),
+]
+
+def system(rules):
+    return rewriting.RewriteSystem([(parse(left), parse(right)) for left, right in rules])
+
+def randomGroupTerm(random, depth):
+    if depth == 0 or random.random() < 0.1:
+        return terms.Application(random.choice("eabc"))
+    if random.random() < 0.3:
+        return terms.Application("i", randomGroupTerm(random, depth - 1))
+    return terms.Application("*", randomGroupTerm(random, depth - 1), randomGroupTerm(random, depth - 1))
+
+def numeral(n):
+    term = terms.Application("0")
+    for _ in range(n):
+        term = terms.Application("s", term)
+    return term
+
+def measure(rewriteSystem, inputs):
+    start = time.perf_counter()
+    for term in inputs:
+        rewriteSystem.normalize(term)
+    return time.perf_counter() - start
+
+def main():
+    rng = random.Random(42)
+    benchmarks = [
+        ("groups, depth 8", groupRules, [randomGroupTerm(rng, 8) for _ in range(200)]),
+        ("groups, depth 12", groupRules, [randomGroupTerm(rng, 12) for _ in range(20)]),
+        ("arithmetic 30*30", arithmeticRules, [terms.Application("*", numeral(30), numeral(30))]),
+        ("arithmetic n*n", arithmeticRules, [terms.Application("*", numeral(n), numeral(n)) for n in range(1, 40)]),
+    ]
+
+    print("%-18s %8s %12s %12s" % ("benchmark", "terms", "cold s", "warm s"))
+    for name, rules, inputs in benchmarks:
+        rewriteSystem = system(rules)
+        cold = measure(rewriteSystem, inputs)
+        warm = measure(rewriteSystem, inputs)
+        print("%-18s %8d %12.4f %12.4f" % (name, len(inputs), cold, warm))
+
+if __name__ == '__main__':
+    main()
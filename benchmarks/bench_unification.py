@@ -0,0 +1,90 @@
+"""Compare `unification.unify` with textbook unification by eager substitution
+on deep and on heavily shared terms.
+
+    python benchmarks/bench_unification.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import terms
+import unification
+
+def naiveUnify(term1, term2):
+    """Robinson's algorithm, applying each new binding to everything right away."""
+    substitution = {}
+    pairs = [(term1, term2)]
+    while pairs:
+        left, right = pairs.pop()
+        left = left.substitute(substitution)
+        right = right.substitute(substitution)
+        if left is right:
+            continue
+
+        if isinstance(right, terms.Variable):
+            left, right = right, left
+
+        if isinstance(left, terms.Variable):
+            if left in unification.variables(right):
+                return None
+            binding = {left.name: right}
+            substitution = {name: term.substitute(binding) for name, term in substitution.items()}
+            substitution[left.name] = right
+            continue
+
+        if left.function_name != right.function_name or len(left.arguments) != len(right.arguments):
+            return None
+        pairs.extend(zip(left.arguments, right.arguments))
+
+    return substitution
+
+def chain(depth):
+    """s(s(...s(:x)...)) against s(s(...s(0)...))"""
+    left = terms.Variable('x')
+    right = terms.Application('0')
+    for _ in range(depth):
+        left = terms.Application('s', left)
+        right = terms.Application('s', right)
+    return left, right
+
+def shared(n):
+    """f(:x1, ..., :xn) against f(g(:x0, :x0), ..., g(:x(n-1), :x(n-1))).
+    The unifier binds :xn to a tree of size 2^n, which is a DAG of size n."""
+    variables = [terms.Variable('x%d' % i) for i in range(n + 1)]
+    left = terms.Application('f', *variables[1:])
+    right = terms.Application('f', *[terms.Application('g', v, v) for v in variables[:-1]])
+    return left, right
+
+def measure(function, term1, term2):
+    start = time.perf_counter()
+    function(term1, term2)
+    return time.perf_counter() - start
+
+def main():
+    sys.setrecursionlimit(10000)
+    inputs = [
+        ("chain 1000", chain(1000)),
+        ("chain 100000", chain(100000)),
+        ("shared 12", shared(12)),
+        ("shared 18", shared(18)),
+        ("shared 1000", shared(1000)),
+    ]
+
+    print("%-14s %12s %12s" % ("input", "unify s", "naive s"))
+    for name, (term1, term2) in inputs:
+        fast = "%.4f" % measure(unification.unify, term1, term2)
+        if name in ("chain 100000", "shared 1000"):
+            naive = "skipped"
+        else:
+            try:
+                naive = "%.4f" % measure(naiveUnify, term1, term2)
+            except RecursionError:
+                naive = "RecursionError"
+
+        print("%-14s %12s %12s" % (name, fast, naive))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""Seeded random generators of terms, equations, substitutions and calculator
+scripts for the benchmarks. The same seed and parameters always give the same
+inputs, so timings of different runs are comparable.
+
+    generator = RandomTerms(seed=1, depth=100, width=3, sharing=0.2, variableRatio=0.3)
+    term = generator.term(1000)
+"""
+
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import terms
+
+# Function symbols and their arities. The constants are the symbols of arity 0.
+defaultSignature = {'f': 2, 'g': 1, 'h': 3, 'k': 2, 'a': 0, 'b': 0, 'c': 0, 'e': 0}
+
+class RandomTerms(object):
+    """Generate terms over a signature.
+
+    `depth` limits the depth of the terms and `width` the arity of the function
+    symbols used. With probability `sharing`, a subterm is one generated before
+    instead of a new one, so the terms are DAGs with fewer distinct nodes than
+    their trees. `variableRatio` is the fraction of leaves that are variables."""
+
+    def __init__(self, seed=0, signature=None, variables=('x', 'y', 'z', 'w'),
+            depth=100, width=3, sharing=0.2, variableRatio=0.3):
+        self.random = random.Random(seed)
+        signature = defaultSignature if signature is None else signature
+        self.functions = sorted(name for name, arity in signature.items() if 0 < arity <= width)
+        self.constants = sorted(name for name, arity in signature.items() if arity == 0)
+        if not self.functions or not self.constants:
+            raise ValueError("The signature needs constants and function symbols of arity at most %d" % width)
+        self.signature = dict(signature)
+        self.variables = list(variables)
+        self.depth = depth
+        self.sharing = sharing
+        self.variableRatio = variableRatio
+        # Earlier subterms by their sizes, to be shared
+        self.pool = {}
+
+    def leaf(self):
+        if self.variables and self.random.random() < self.variableRatio:
+            return terms.Variable(self.random.choice(self.variables))
+        return terms.Application(self.random.choice(self.constants))
+
+    def term(self, size, depth=None):
+        """Return a term with `size` nodes, counted as a tree, or with fewer if
+        the depth limit is reached first. The term is built without recursion,
+        so its depth is only limited by `depth`."""
+        if depth is None:
+            depth = self.depth
+
+        # The applications whose arguments are being generated, each with its
+        # function symbol, size, depth, the sizes of the arguments still to be
+        # generated, last first, and the arguments generated so far
+        stack = []
+        while True:
+            if size <= 1 or depth == 0:
+                term = self.leaf()
+            else:
+                shared = self.pool.get(size)
+                if shared and self.random.random() < self.sharing:
+                    term = self.random.choice(shared)
+                else:
+                    name = self.random.choice([name for name in self.functions if self.signature[name] < size])
+                    arity = self.signature[name]
+                    # Split the remaining nodes among the arguments at distinct random cut points
+                    cuts = sorted(self.random.sample(range(1, size - 1), arity - 1))
+                    sizes = [end - start for start, end in zip([0] + cuts, cuts + [size - 1])]
+                    sizes.reverse()
+                    stack.append((name, size, depth, sizes, []))
+                    size, depth = sizes.pop(), depth - 1
+                    continue
+
+            # Pass the term up to the application waiting for it, and finish the
+            # applications which have all their arguments now
+            while stack:
+                name, applicationSize, _, sizes, arguments = stack[-1]
+                arguments.append(term)
+                if sizes:
+                    break
+                stack.pop()
+                term = terms.Application(name, *arguments)
+                shared = self.pool.setdefault(applicationSize, [])
+                if len(shared) < 16:
+                    shared.append(term)
+
+            if not stack:
+                return term
+            size, depth = stack[-1][3].pop(), stack[-1][2] - 1
+
+    def terms(self, count, size):
+        return [self.term(size) for _ in range(count)]
+
+    def equation(self, size):
+        return (self.term(size), self.term(size))
+
+    def equations(self, count, size):
+        return [self.equation(size) for _ in range(count)]
+
+    def substitution(self, size):
+        """Map every variable to a term."""
+        return {name: self.term(size) for name in self.variables}
+
+    def script(self, commands, size):
+        """Return the lines of a calculator script with about `commands` commands.
+        They enter equations and derive new ones with every inference rule."""
+        lines = []
+        # The number of equations the script has entered or derived
+        count = 0
+        while len(lines) < commands:
+            left, middle, right = self.term(size), self.term(size), self.term(size)
+            lines.append("enter %s %s %s %s" % (left, middle, middle, right))
+            first = count + 1
+            count += 2
+
+            choice = self.random.randrange(5)
+            if choice == 0:
+                lines.append("combine %d %d" % (first, first + 1))
+                count += 1
+            elif choice == 1:
+                lines.append("reverse %d" % first)
+                count += 1
+            elif choice == 2:
+                lines.append("self @%d" % first)
+                count += 2
+            elif choice == 3:
+                binary = [name for name in self.functions if self.signature[name] == 2] or self.functions
+                lines.append("apply %s @%d @%d" % (self.random.choice(binary), first, first + 1))
+                count += 1
+            else:
+                bindings = " ".join("%s=%s" % (name, self.term(max(1, size // 4))) for name in self.variables)
+                lines.append("subst @%d %s" % (first, bindings))
+                count += 1
+
+        return lines
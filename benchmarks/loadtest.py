@@ -0,0 +1,121 @@
+"""Drive many concurrent sessions against a calculator server and measure the
+throughput and the latency of the commands.
+
+Without an address, a server is started on a Unix socket in a temporary directory.
+
+    python benchmarks/loadtest.py --sessions 100
+    python benchmarks/loadtest.py --port 7777 --sessions 100 --script group.txt
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+serverPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'server.py')
+
+defaultScript = [
+    "enter *(e, :x) :x *(-1(:x), :x) e *(*(:x, :y), :z) *(:x, *(:y, :z))",
+    "normalize *(e, *(-1(*(e, a)), *(a, b))) using @1 @2 @3",
+    "combine 3 1",
+    "subst @3 x=a y=b z=c",
+    "find generalizations *(e, *(a, b))",
+    "complete @1 @2 @3",
+    "prove *(-1(a), *(a, b)) b",
+    "show all",
+    "help prove",
+    "enter",
+]
+
+async def readResponse(reader):
+    """Read up to the next prompt at the start of a line."""
+    response = await reader.readuntil(b"> ")
+    while response != b"> " and not response.endswith(b"\n> "):
+        response += await reader.readuntil(b"> ")
+    return response
+
+async def session(connect, commands, latencies):
+    reader, writer = await connect()
+    await readResponse(reader)
+    for command in commands:
+        start = time.perf_counter()
+        writer.write(command.encode('utf-8') + b"\n")
+        await writer.drain()
+        await readResponse(reader)
+        latencies.append(time.perf_counter() - start)
+
+    writer.write(b"exit\n")
+    await writer.drain()
+    await reader.read()
+    writer.close()
+    await writer.wait_closed()
+
+async def run(connect, sessions, commands):
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*[session(connect, commands, latencies) for _ in range(sessions)])
+    return time.perf_counter() - start, sorted(latencies)
+
+async def waitForServer(connect, timeout=10.0):
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            _, writer = await connect()
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise
+            await asyncio.sleep(0.05)
+        else:
+            writer.close()
+            return
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def main():
+    argumentParser = argparse.ArgumentParser(description="Load test for the calculator server")
+    argumentParser.add_argument('--sessions', type=int, default=50, help="the number of concurrent sessions")
+    argumentParser.add_argument('--script', help="a file with the commands each session sends")
+    argumentParser.add_argument('--port', type=int)
+    argumentParser.add_argument('--host', default='localhost')
+    argumentParser.add_argument('--unix', metavar='PATH')
+    arguments = argumentParser.parse_args()
+
+    if arguments.script:
+        with open(arguments.script) as script:
+            commands = [line.strip() for line in script if line.strip() and not line.startswith('#')]
+    else:
+        commands = defaultScript
+
+    server = None
+    directory = None
+    path = arguments.unix
+    if arguments.port is None and path is None:
+        directory = tempfile.TemporaryDirectory()
+        path = os.path.join(directory.name, 'calculator.sock')
+        server = subprocess.Popen([sys.executable, serverPath, '--unix', path])
+
+    if path is not None:
+        connect = lambda: asyncio.open_unix_connection(path, limit=1 << 24)
+    else:
+        connect = lambda: asyncio.open_connection(arguments.host, arguments.port, limit=1 << 24)
+
+    try:
+        asyncio.run(waitForServer(connect))
+        seconds, latencies = asyncio.run(run(connect, arguments.sessions, commands))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+            directory.cleanup()
+
+    print("%d sessions, %d commands in %.3f s (%.1f commands/s)" % (
+            arguments.sessions, len(latencies), seconds, len(latencies) / seconds))
+    print("latency: median %.2f ms, 90%% %.2f ms, 99%% %.2f ms, max %.2f ms" % tuple(
+            1000 * percentile(latencies, fraction) for fraction in (0.5, 0.9, 0.99, 1.0)))
+
+if __name__ == '__main__':
+    main()
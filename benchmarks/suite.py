@@ -0,0 +1,227 @@
+"""Time the hot paths on random inputs of growing size, and compare the results
+with a baseline saved by an earlier run.
+
+Every benchmark runs for each term size, in nodes counted as trees. Fewer terms
+are used for bigger sizes, so each size takes about the same number of nodes.
+The throughput is the best of several passes over the inputs. The peak memory
+is traced during a separate first pass.
+
+    python benchmarks/suite.py
+    python benchmarks/suite.py --sizes 10 1000 --only parse subst --save baseline.json
+    python benchmarks/suite.py --compare baseline.json
+"""
+
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import calculator
+import equationparser
+import equations
+import generators
+import terms
+
+class Benchmark(object):
+    """`prepare` takes a generator, a term size and a number of terms and returns
+    the inputs. `operation` is called with each input, unpacked. `weight` tells
+    how many operations an input counts as."""
+
+    def __init__(self, name, prepare, operation, weight=None):
+        self.name = name
+        self.prepare = prepare
+        self.operation = operation
+        self.weight = weight
+
+    def operations(self, inputs):
+        if self.weight is None:
+            return len(inputs)
+        return sum(self.weight(*input_) for input_ in inputs)
+
+    def runPass(self, inputs):
+        operation = self.operation
+        start = time.perf_counter()
+        for input_ in inputs:
+            operation(*input_)
+        return time.perf_counter() - start
+
+def pairs(generator, size, count):
+    """Half of the pairs are the same term twice."""
+    first = generator.terms(count, size)
+    second = generator.terms(count, size)
+    return [(term, term if i % 2 else other) for i, (term, other) in enumerate(zip(first, second))]
+
+def chains(generator, size, count):
+    """Pairs of equations which can be combined by transitivity."""
+    inputs = []
+    for _ in range(count):
+        left, middle, right = generator.terms(3, size)
+        inputs.append(((left, middle), (middle, right)))
+    return inputs
+
+def substitutionSize(size):
+    return max(1, size // 10)
+
+def replay(lines):
+    calculator_ = calculator.Calculator(io.StringIO(), io.StringIO())
+    calculator_.echo = False
+    calculator_.runScript(lines)
+    if calculator_.failure is not None:
+        raise RuntimeError("The script failed at line %d: %s (%s)" % calculator_.failure)
+
+benchmarks = [
+    Benchmark('parse',
+            lambda generator, size, count: [(str(term),) for term in generator.terms(count, size)],
+            lambda source: equationparser.Parser(source).parseTerm()),
+    Benchmark('termsEqual', pairs, terms.termsEqual),
+    Benchmark('substitute',
+            lambda generator, size, count: [(term, generator.substitution(substitutionSize(size)))
+                    for term in generator.terms(count, size)],
+            lambda term, substitution: term.substitute(substitution)),
+    Benchmark('str',
+            lambda generator, size, count: [(term,) for term in generator.terms(count, size)],
+            str),
+    # A mapping instead of a `Signature`, so every call checks the whole term
+    Benchmark('matchesSignature',
+            lambda generator, size, count: [(term, generator.signature) for term in generator.terms(count, size)],
+            terms.matchesSignature),
+    Benchmark('refl',
+            lambda generator, size, count: [(term,) for term in generator.terms(count, size)],
+            equations.employReflexivity),
+    Benchmark('sym',
+            lambda generator, size, count: [(equation,) for equation in generator.equations(count, size)],
+            equations.employSymmetry),
+    Benchmark('trans', chains, equations.employTransitivity),
+    Benchmark('cong',
+            lambda generator, size, count: [('f', equation, other) for equation, other in chains(generator, size, count)],
+            equations.employCongruence),
+    Benchmark('subst',
+            lambda generator, size, count: [(equation, generator.substitution(substitutionSize(size)))
+                    for equation in generator.equations(count, size)],
+            equations.employSubstitution),
+    # Batches of ten equations
+    Benchmark('subst batch',
+            lambda generator, size, count: [(generator.equations(10, size), generator.substitution(substitutionSize(size)))
+                    for _ in range(max(1, count // 10))],
+            equations.employSubstitutionBatch,
+            lambda equations_, substitution: len(equations_)),
+    # Scripts of about 20 commands, counting commands as operations
+    Benchmark('script',
+            lambda generator, size, count: [(generator.script(20, size),) for _ in range(max(1, count // 20))],
+            replay,
+            len),
+]
+
+def measure(benchmark, generator, size, count, repeat):
+    inputs = benchmark.prepare(generator, size, count)
+    operations = benchmark.operations(inputs)
+
+    gc.collect()
+    tracemalloc.start()
+    benchmark.runPass(inputs)
+    peakBytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    seconds = min(benchmark.runPass(inputs) for _ in range(repeat))
+    return {
+        'benchmark': benchmark.name,
+        'size': size,
+        'operations': operations,
+        'seconds': seconds,
+        'operationsPerSecond': operations / seconds if seconds else float('inf'),
+        'peakBytes': peakBytes,
+    }
+
+def compare(results, baseline, tolerance):
+    """Print the change of the throughput against the baseline, and return the
+    number of results which got slower by more than `tolerance`."""
+    previous = {(result['benchmark'], result['size']): result for result in baseline['results']}
+    regressions = 0
+    print()
+    print("%-18s %8s %14s %14s %9s" % ("benchmark", "size", "baseline op/s", "op/s", "change"))
+    for result in results:
+        old = previous.get((result['benchmark'], result['size']))
+        if old is None:
+            continue
+        change = result['operationsPerSecond'] / old['operationsPerSecond'] - 1.0
+        mark = ""
+        if change < -tolerance:
+            regressions += 1
+            mark = "  slower"
+        print("%-18s %8d %14.1f %14.1f %+8.1f%%%s" % (result['benchmark'], result['size'],
+                old['operationsPerSecond'], result['operationsPerSecond'], 100 * change, mark))
+    return regressions
+
+def main():
+    argumentParser = argparse.ArgumentParser(description="Benchmark the hot paths on random terms")
+    argumentParser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000], help="the term sizes in nodes")
+    argumentParser.add_argument('--nodes', type=int, default=20000, help="the number of nodes of the inputs of each size")
+    argumentParser.add_argument('--repeat', type=int, default=5, help="the number of timed passes, of which the best counts")
+    argumentParser.add_argument('--only', nargs='+', metavar='NAME', help="only run these benchmarks")
+    argumentParser.add_argument('--seed', type=int, default=0)
+    argumentParser.add_argument('--depth', type=int, default=100, help="the maximal depth of the terms")
+    argumentParser.add_argument('--width', type=int, default=3, help="the maximal arity of the function symbols")
+    argumentParser.add_argument('--sharing', type=float, default=0.2, help="the probability of reusing an earlier subterm")
+    argumentParser.add_argument('--variable-ratio', type=float, default=0.3, help="the fraction of leaves which are variables")
+    argumentParser.add_argument('--save', metavar='PATH', help="save the results as a JSON baseline")
+    argumentParser.add_argument('--compare', metavar='PATH', help="compare the results with a saved baseline")
+    argumentParser.add_argument('--tolerance', type=float, default=0.2,
+            help="the loss of throughput against the baseline reported as a regression (default: 0.2)")
+    arguments = argumentParser.parse_args()
+
+    selected = [benchmark for benchmark in benchmarks if not arguments.only or benchmark.name in arguments.only]
+    if not selected:
+        argumentParser.error("No benchmark is called %s" % ", ".join(arguments.only))
+
+    parameters = {
+        'seed': arguments.seed,
+        'nodes': arguments.nodes,
+        'repeat': arguments.repeat,
+        'depth': arguments.depth,
+        'width': arguments.width,
+        'sharing': arguments.sharing,
+        'variableRatio': arguments.variable_ratio,
+    }
+
+    results = []
+    print("%-18s %8s %8s %12s %14s %12s" % ("benchmark", "size", "ops", "seconds", "op/s", "peak KiB"))
+    for benchmark in selected:
+        for size in arguments.sizes:
+            # Every benchmark and size gets its own inputs, which don't depend
+            # on the other benchmarks selected
+            generator = generators.RandomTerms(arguments.seed * 1000003 + size, depth=arguments.depth,
+                    width=arguments.width, sharing=arguments.sharing, variableRatio=arguments.variable_ratio)
+            result = measure(benchmark, generator, size, max(1, arguments.nodes // size), arguments.repeat)
+            results.append(result)
+            print("%-18s %8d %8d %12.6f %14.1f %12.1f" % (result['benchmark'], size, result['operations'],
+                    result['seconds'], result['operationsPerSecond'], result['peakBytes'] / 1024))
+
+    if arguments.save:
+        with open(arguments.save, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'parameters': parameters,
+                'results': results,
+            }, f, indent=2)
+            f.write("\n")
+
+    regressions = 0
+    if arguments.compare:
+        with open(arguments.compare) as f:
+            baseline = json.load(f)
+        if baseline.get('parameters') != parameters:
+            print("Warning: the baseline was measured with other parameters: %s" % baseline.get('parameters'))
+        regressions = compare(results, baseline, arguments.tolerance)
+        print("%d results slower than the baseline by more than %.0f%%" % (regressions, 100 * arguments.tolerance))
+
+    sys.exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,23 @@
+import completion
+import congruence
+import derivations
 import equations
 import equationparser
+import instrumentation
+import models
+import proofsearch
+import rewriting
+import sessionfile
+import termindex
 import terms
+import unification
 
+import argparse
 import cmd
 import functools
+import io
 import shlex
+import time
 
 class Calculator(cmd.Cmd):
     def __init__(self, stdin, stdout):
@@ -14,9 +27,49 @@ class Calculator(cmd.Cmd):
         self.prompt = "> "
         
         # Contains equations
-        # TODO: Also store information about how the equations were generated.
-        #  This is necessary to generate and print a proof tree
         self.equations = []
+        
+        # How each of the equations was generated, to print proof trees
+        self.derivations = derivations.DerivationStore()
+        
+        self.resetIndexes()
+        
+        # Whether new equations are printed as soon as they are added
+        self.echo = True
+        
+        # The finite model equations are checked in
+        self.model = None
+        
+        # The declared arities of the function symbols. New equations are checked against them.
+        self.signature = None
+        
+        # Whether addEquation returns a known equal equation instead of adding a
+        # duplicate: None, 'exact' or 'variants' (up to renaming of variables).
+        # Equations with exchanged sides are equal, too, if `deduplicateSymmetric` is set.
+        self.deduplication = None
+        self.deduplicateSymmetric = False
+        
+        # The number of errors so far, and the first error of the current command.
+        # runScript records the number, text and first error of the first line
+        # that caused an error.
+        self.errorCount = 0
+        self.firstError = None
+        self.failure = None
+        
+        # Whether commands may read and write files. It is turned off for
+        # sessions served to clients, which mustn't access the server's files.
+        self.fileAccess = True
+        
+        # The longest time, in seconds, which complete, prove and normalize may
+        # take, or None if they may take as long as their own limits allow
+        self.timeLimit = None
+        
+        # The most characters printed of a term, or None. Longer terms are cut
+        # off, which keeps the output of sessions served to clients bounded.
+        self.maxTermLength = None
+        
+        # The statistics recorded for this session, or None if recording is off
+        self.statistics = None
     
     def do_exit(self, arg):
         """Quit the calculator"""
@@ -51,20 +104,38 @@ class Calculator(cmd.Cmd):
         except equationparser.ParseError as e:
             self.printError(e)
     
+    def do_read(self, arg):
+        """Read equations from a file. Each two consecutive terms will form a new equation.
+        The file is parsed incrementally, so it may be larger than the available memory.
+        
+        > read group.eq
+        @1: *(e, :x) <=> :x
+        @2: *(-1(:x), :x) <=> e
+        @3: *(*(:x, :y), :z) <=> *(:x, *(:y, :z))
+        """
+        if not self.checkFileAccess():
+            return
+        
+        try:
+            for equation in equationparser.parseFile(arg.strip()):
+                self.addEquation(equation)
+        except (equationparser.ParseError, OSError) as e:
+            self.printError(e)
+    
     def do_reverse(self, arg):
         """Specify a number of equations which shall be reversed.
         
-        > enter "*(e, :x)" ":x"
+        > enter *(e, :x) :x
         @1: *(e, :x) <=> :x
         > reverse 1
         @2: :x <=> *(e, :x)
         > reverse 1 2
-        @2: :x <=> *(e, :x)
-        @1: *(e, :x) <=> :x
+        @3: :x <=> *(e, :x)
+        @4: *(e, :x) <=> :x
         """
         try:
             p = equationparser.Parser(arg)
-            references = p.parseIntegerList(arg)
+            references = p.parseReferences()
         except equationparser.ParseError as e:
             self.printError(e)
             return
@@ -72,22 +143,22 @@ class Calculator(cmd.Cmd):
         for index in references:
             equation = self.getEquation(index)
             if equation:
-                self.addEquation(equations.employSymmetry(equation))
+                self.addEquation(equations.employSymmetry(equation), derivations.SYMMETRY, (index,))
     
     def do_apply(self, arg):
         """Specify a number of equations and a function symbol. A new equation will be generated using the function symbol and the specified equations.
         
-        > enter "*(e, :x)" ":x"
+        > enter *(e, :x) :x
         @1: *(e, :x) <=> :x
-        > enter "*(-1(:x), :x)" e
+        > enter *(-1(:x), :x) e
         @2: *(-1(:x), :x) <=> e
-        > apply "t" @1 @2
+        > apply t @1 @2
         @3: t(*(e, :x), *(-1(:x), :x)) <=> t(:x, e)
         """
         try:
-            p = parser.Parser(arg)
+            p = equationparser.Parser(arg)
             name = p.parseFunctionSymbol(sourceMayEmpty=False)
-            references = self.parseIntegerList()
+            references = p.parseReferences()
         except equationparser.ParseError as e:
             self.printError(e)
             return
@@ -97,7 +168,7 @@ class Calculator(cmd.Cmd):
             # In this case, some equations don't exist
             return
         
-        self.addEquation(equations.employCongruence(name, *equations_))
+        self.addEquation(equations.employCongruence(name, *equations_), derivations.CONGRUENCE, references)
     
     def do_self(self, arg):
         """Enter some terms. Then equations, stating that each of the specified terms is equal to itself, is generated.
@@ -107,13 +178,11 @@ class Calculator(cmd.Cmd):
         > self t(2) t(4)
         @2: t(2) <=> t(2)
         @3: t(4) <=> t(4)
-        > enter "*(e, :x)" ":x"
+        > enter *(e, :x) :x
         @4: *(e, :x) <=> :x
         > self @4
         @5: *(e, :x) <=> *(e, :x)
-        @1: :x <=> :x
-        > self @2
-        @2: t(2) <=> t(2)
+        @6: :x <=> :x
         """
         try:
             p = equationparser.Parser(arg)
@@ -132,21 +201,21 @@ class Calculator(cmd.Cmd):
                 if not equation:
                     continue
                 
-                self.addEquation(equations.employReflexivity(equation[0]))
-                self.addEquation(equations.employReflexivity(equation[1]))
+                self.addEquation(equations.employReflexivity(equation[0]), derivations.REFLEXIVITY)
+                self.addEquation(equations.employReflexivity(equation[1]), derivations.REFLEXIVITY)
                 
             else:
                 assert isinstance(item, terms.Term)
-                self.addEquation(equations.employReflexivity(item))
+                self.addEquation(equations.employReflexivity(item), derivations.REFLEXIVITY)
     
     def do_subst(self, arg):
         """Select some equations and enter the substitution which shall be applied
         
-        > enter "*(*(:x, :y), :z)" "*(:x, *(:y, :z))"
+        > enter *(*(:x, :y), :z) *(:x, *(:y, :z))
         @1: *(*(:x, :y), :z) <=> *(:x, *(:y, :z))
         > subst @1 x=e y=-(-e)
         @2: *(*(e, -(-e)), :z) <=> *(e, *(-(-e), :z))
-        > subst @1 z="*(-(e), e)"
+        > subst @1 z=*(-(e), e)
         @3: *(*(:x, :y), *(-(e), e)) <=> *(:x, *(:y, *(-(e), e)))
         > subst @2 z=*(-(e),e)
         @4: *(*(e, -(-e)), *(-(e), e)) <=> *(e, *(-(-e), *(-(e), e)))
@@ -159,10 +228,11 @@ class Calculator(cmd.Cmd):
             if len(references) != len(equations_):
                 return
             
-            pairs = [p.parseSubstitution(True)]
+            pairs = []
+            pair = p.parseSubstitution(True)
             while pair:
-                #print(pair)
-                pairs.append(p.parseSubstitution(True))
+                pairs.append(pair)
+                pair = p.parseSubstitution(True)
         
         except equationparser.ParseError as e:
             self.printError(e)
@@ -171,9 +241,8 @@ class Calculator(cmd.Cmd):
         # Build the substitution.
         substitution = dict(pairs)
         
-        for equation in equations_:
-            equation = equations.employSubstitution(equation, substitution)
-            self.addEquation(equation)
+        for index, equation in zip(references, equations.employSubstitutionBatch(equations_, substitution)):
+            self.addEquation(equation, derivations.SUBSTITUTION, (index,))
 
     def do_show(self, arg):
         """Display some or all known equations.
@@ -192,100 +261,950 @@ class Calculator(cmd.Cmd):
         > show all
         @1: *(e, :x) <=> :x
         @2: (-1(:x), :x) <=> e
-        @3: *(*(:x, :y), :z) <=> *(:x, *(:y, :z))"""
+        @3: *(*(:x, :y), :z) <=> *(:x, *(:y, :z))
+        > show all depth 1
+        @1: *(e, :x) <=> :x
+        @2: *(..., :x) <=> e
+        @3: *(..., :z) <=> *(:x, ...)"""
         
         if len(arg.strip()) == 0:
             self.printError("Which equations shall be shown?")
             self.printError("Hint: > show all")
             return
         
-        indizes = []
-        if arg.strip().lower() == 'all':
-            indizes = range(1, len(self.equations)+1)
-        else:
-            try:
-                p = equationparser.Parser(arg)
-                indizes = p.parseReferences(arg)
-            except equationparser.ParseError as e:
-                self.printError(e)
-                return
+        try:
+            p = equationparser.Parser(arg)
+            p.skipWhitespace()
+            if p.src[p.pos:p.pos + 3].lower() == 'all':
+                p.pos += 3
+                indizes = range(1, len(self.equations)+1)
+            else:
+                indizes = p.parseReferences()
+            
+            # Arguments nested deeper are abbreviated
+            maxDepth = None
+            if p.parseKeyword('depth'):
+                maxDepth = p.parseInt()
+                if maxDepth is None:
+                    raise equationparser.ParseError("Expected the depth at %i" % p.pos, p.pos)
+        except equationparser.ParseError as e:
+            self.printError(e)
+            return
         
         for index in indizes:
+            self.printEquation(index, maxDepth)
+    
+    def do_find(self, arg):
+        """Find the equations with a side which the term is an instance of, or which is an instance of the term.
+        Either kind of result can be requested on its own.
+        
+        > enter *(e, :x) :x *(-1(:x), :x) e
+        @1: *(e, :x) <=> :x
+        @2: *(-1(:x), :x) <=> e
+        > find instances *(:y, :z)
+        @1: *(e, :x) <=> :x
+        @2: *(-1(:x), :x) <=> e
+        > find generalizations *(e, e)
+        @1: *(e, :x) <=> :x
+        """
+        generalizations = instances = True
+        mode, _, rest = arg.strip().partition(' ')
+        if mode == 'instances':
+            generalizations, arg = False, rest
+        elif mode == 'generalizations':
+            instances, arg = False, rest
+        
+        try:
+            term = equationparser.Parser(arg).parseTerm()
+        except equationparser.ParseError as e:
+            self.printError(e)
+            return
+        
+        indizes = set()
+        if generalizations:
+            indizes.update(self.findGeneralizations(term))
+        if instances:
+            indizes.update(self.findInstances(term))
+        
+        for index in sorted(indizes):
             self.printEquation(index)
     
+    def do_entails(self, arg):
+        """Enter two terms to check whether their equality follows from the known equations by congruence closure.
+        Variables are treated like constants, so the check is sound, but doesn't use instances of the equations.
+        
+        > enter *(e, :x) :x
+        @1: *(e, :x) <=> :x
+        > entails *(e, *(e, :x)) :x
+        -- *(e, *(e, :x)) <=> :x follows from the known equations
+        > entails *(e, e) e
+        -- *(e, e) <=> e doesn't follow from the known equations by congruence closure
+        """
+        try:
+            p = equationparser.Parser(arg)
+            left = p.parseTerm()
+            right = p.parseTerm()
+        except equationparser.ParseError as e:
+            self.printError(e)
+            return
+        
+        self.updateIndexes()
+        if self.closure.equal(left, right):
+            self.printMessage("%s <=> %s follows from the known equations" % (self.formatTerm(left), self.formatTerm(right)))
+        else:
+            self.printMessage("%s <=> %s doesn't follow from the known equations by congruence closure" % (
+                    self.formatTerm(left), self.formatTerm(right)))
+    
     def do_combine(self, arg):
         """Use transitivity to combine a number of equations.
         Adjacent sides of the specified equations have to match each other.
+        If they don't, they are unified and the equations are instantiated accordingly.
+        The instances are added as steps derived by substitution, but not printed.
+        Variables occurring in several of the equations are considered to be the same.
         
-        > enter e "*(e, e)"
-        @1: e <=> *(e, e)
-        @2: *(-(e), e) <=> e
-        > combine 2 1
-        @3: *(-(e), e) <=> *(e, e)
-        
-        Future use case:
-        > enter s(:y) :z :x 2
-        @1: s(:y) <=> :y
-        @2: :x <=> 2
+        > enter *(-(e), e) e e *(e, e)
+        @1: *(-(e), e) <=> e
+        @2: e <=> *(e, e)
         > combine 1 2
-        @3: s(:x) <=> 2
+        @3: *(-(e), e) <=> *(e, e)
+        > enter s(:y) :y :x 2
+        @4: s(:y) <=> :y
+        @5: :x <=> 2
+        > combine 4 5
+        @7: s(:y) <=> 2
         """
         try:
             p = equationparser.Parser(arg)
             references = p.parseReferences()
             if len(references) < 2:
-                printError("Expected at least two references to equations")
+                self.printError("Expected at least two references to equations")
                 return
         except equationparser.ParseError as e:
             self.printError(e)
             return
         
-        invalidReferences = filter(lambda i: i >= len(self.equations), references)
-        if invalidReferences:
-            self.printError("The following references are invalid: %s" % ", ".join(invalidReferences))
+        equations_ = tuple(filter(bool, map(self.getEquation, references)))
+        if len(equations_) != len(references):
+            # In this case, some equations don't exist
             return
         
-        def combineEquations(left, right):
-            pos, ok, left = left
-            pos_plus_1, _, right = right
+        # Adjacent sides which differ are unified, and the unifier is applied to
+        # all equations up to there. If there are errors because of non-unifiable
+        # adjacent sides, the matching continues to spot other errors.
+        instances = list(equations_)
+        ok = True
+        for i in range(1, len(instances)):
+            if instances[i - 1][1] is instances[i][0]:
+                continue
             
-            if e1[1] != e2[0]:
-                printError("Equations %d and %d don't have matching adjacent sides" % (pos, pos_plus_1))
-                # The matching has to continue to spot other errors
-                return (pos_plus_1, False, right)
+            substitution = unification.unify(instances[i - 1][1], instances[i][0])
+            if substitution is None:
+                self.printError("The left side of equation @%d can't be unified with the preceding right side" % references[i])
+                ok = False
+                continue
             
-            return pos_plus_1, ok , employTransitivity(left, right)
+            memo = {}
+            for j in range(i + 1):
+                instances[j] = equations.employSubstitution(instances[j], substitution, memo)
+        
+        if not ok:
+            return
         
-        data = zip(map(getEquation, references), repeat(True), count(1))
+        # The instantiated equations are added as steps of their own, so that
+        # the transitivity step only connects identical sides
+        premises = []
+        echo, self.echo = self.echo, False
+        try:
+            for reference, equation, instance in zip(references, equations_, instances):
+                if instance != equation:
+                    reference = self.addEquation(instance, derivations.SUBSTITUTION, (reference,), exact=True)
+                premises.append(reference)
+        finally:
+            self.echo = echo
+        
+        result = functools.reduce(equations.employTransitivity, instances)
+        self.addEquation(result, derivations.TRANSITIVITY, premises)
+    
+    def do_normalize(self, arg):
+        """Rewrite a term to normal form. The specified equations are used as rewrite rules from left to right.
+        
+        > enter *(e, :x) :x *(-1(:x), :x) e
+        @1: *(e, :x) <=> :x
+        @2: *(-1(:x), :x) <=> e
+        > normalize *(e, *(-1(*(e, a)), a)) using @1 @2
+        @3: *(e, *(-1(*(e, a)), a)) <=> e
+        """
+        try:
+            p = equationparser.Parser(arg)
+            term = p.parseTerm()
+            if not p.parseKeyword('using'):
+                raise equationparser.ParseError("Expected \"using\" and the rewrite rules at %i" % p.pos, p.pos)
+            references = p.parseReferences()
+        except equationparser.ParseError as e:
+            self.printError(e)
+            return
+        
+        system = self.getRewriteSystem(references)
+        if not system:
+            return
+        
+        try:
+            normalForm = system.normalize(term, self.timeLimit)
+        except rewriting.RewriteError as e:
+            self.printError(e)
+            return
+        
+        self.addEquation((term, normalForm), derivations.REWRITING, references)
+    
+    def do_complete(self, arg):
+        """Turn the specified equations into a convergent rewrite system by Knuth-Bendix completion.
+        The rules are oriented by a lexicographic path order. The function symbols
+        listed after "order" are greatest, from left to right. The completion gives up
+        after 10000 steps or the given number of steps or seconds.
+        
+        > enter *(e, :x) :x *(-1(:x), :x) e *(*(:x, :y), :z) *(:x, *(:y, :z))
+        @1: *(e, :x) <=> :x
+        @2: *(-1(:x), :x) <=> e
+        @3: *(*(:x, :y), :z) <=> *(:x, *(:y, :z))
+        > complete @1 @2 @3 seconds 10 order -1 * e
+        @4: *(e, :x) <=> :x
+        ...
+        @13: -1(*(:x, :y)) <=> *(-1(:y), -1(:x))
+        -- Completed after 125 steps in 0.03 s: 10 rules, 124 critical pairs, 7 rules removed by interreduction
+        """
+        try:
+            p = equationparser.Parser(arg)
+            references = p.parseReferences()
+            maxSteps, timeLimit, order = 10000, None, ()
+            while True:
+                if p.parseKeyword('steps'):
+                    maxSteps = p.parseInt()
+                    if maxSteps is None:
+                        raise equationparser.ParseError("Expected the number of steps at %i" % p.pos, p.pos)
+                elif p.parseKeyword('seconds'):
+                    timeLimit = p.parseInt()
+                    if timeLimit is None:
+                        raise equationparser.ParseError("Expected the number of seconds at %i" % p.pos, p.pos)
+                elif p.parseKeyword('order'):
+                    order = []
+                    p.skipWhitespace()
+                    symbol = p.parseFunctionSymbol(sourceMayEmpty=True)
+                    while symbol:
+                        order.append(symbol)
+                        symbol = p.parseFunctionSymbol(sourceMayEmpty=True)
+                else:
+                    break
+            p.skipWhitespace()
+            if p.pos < len(p.src):
+                raise equationparser.ParseError("Unexpected input at %i" % p.pos, p.pos)
+        except equationparser.ParseError as e:
+            self.printError(e)
+            return
+        
+        equations_ = list(filter(bool, map(self.getEquation, references)))
+        if len(equations_) != len(references):
+            return
+        
+        if self.timeLimit is not None:
+            timeLimit = self.timeLimit if timeLimit is None else min(timeLimit, self.timeLimit)
         
-        # The equations will be combined from left to right.
-        # If there are errors because of non-matching adjacent sides, False will be
-        # passed through.
-        result, ok, pos = functools.reduce(combineEquations, data)
+        def progress(statistics, pending):
+            self.printMessage("Step %d: %d rules, %d equations pending" % (statistics['steps'], statistics['rules'] - statistics['removed'], pending))
         
-        if ok:
-            self.addEquation(result)
+        process = completion.Completion(equations_, completion.LexicographicPathOrder(order),
+                maxSteps, timeLimit, progress)
+        try:
+            rules = process.run()
+        except completion.CompletionError as e:
+            self.printError(e)
+            rules = None
+        
+        if rules is not None:
+            for rule in rules:
+                self.addEquation(rule, derivations.COMPLETION, references)
+        
+        statistics = process.statistics
+        self.printMessage("%s after %d steps in %.2f s: %d rules, %d critical pairs, %d rules removed by interreduction" % (
+                "Completed" if rules is not None else "Stopped",
+                statistics['steps'], statistics['seconds'], len(process.rules()),
+                statistics['critical pairs'], statistics['removed']))
+    
+    def do_prove(self, arg):
+        """Search for a derivation of an equation between two terms. The known equations are
+        applied in both directions to subterms, until the terms are connected. The steps are
+        added as equations derived by substitution, congruence and transitivity, and the
+        last one is printed. The search gives up after visiting 100000 or the given number of terms.
+        
+        > enter *(e, :x) :x *(-1(:x), :x) e *(*(:x, :y), :z) *(:x, *(:y, :z))
+        @1: *(e, :x) <=> :x
+        @2: *(-1(:x), :x) <=> e
+        @3: *(*(:x, :y), :z) <=> *(:x, *(:y, :z))
+        > prove *(-1(a), *(a, b)) b
+        @11: *(-1(a), *(a, b)) <=> b
+        -- Found a chain of 3 steps after visiting 4 terms
+        > prove *(a, e) a limit 1000
+        -- No proof found after visiting 4 terms
+        """
+        try:
+            p = equationparser.Parser(arg)
+            start = p.parseTerm()
+            goal = p.parseTerm()
+            maxTerms = 100000
+            if p.parseKeyword('limit'):
+                maxTerms = p.parseInt()
+                if maxTerms is None:
+                    raise equationparser.ParseError("Expected the number of terms at %i" % p.pos, p.pos)
+        except equationparser.ParseError as e:
+            self.printError(e)
+            return
+        
+        self.updateIndexes()
+        search = proofsearch.ProofSearch(self.equations, self.index, maxTerms, self.timeLimit)
+        steps = search.search(start, goal)
+        if steps is None:
+            self.printError("No proof found after visiting %d terms" % search.visited)
+            return
+        
+        echo, self.echo = self.echo, False
+        try:
+            if not steps:
+                proved = self.addEquation(equations.employReflexivity(start), derivations.REFLEXIVITY, exact=True)
+        
+            reflexivity = {}
+            for i, step in enumerate(steps):
+                index = self.addRewriteStep(step, reflexivity)
+                if i == 0:
+                    proved = index
+                else:
+                    proved = self.addEquation(equations.employTransitivity(self.getEquation(proved), self.getEquation(index)),
+                            derivations.TRANSITIVITY, (proved, index), exact=True)
+        finally:
+            self.echo = echo
+        
+        if self.echo:
+            self.printEquation(proved)
+        self.printMessage("Found a chain of %d steps after visiting %d terms" % (len(steps), search.visited))
+    
+    def addRewriteStep(self, step, reflexivity):
+        """Add the equations deriving the equation between the source and target
+        of a rewrite step. Returns the index of the last one. `reflexivity` maps
+        terms to equations stating that they are equal to themselves."""
+        index = step.index
+        if step.substitution:
+            index = self.addEquation(equations.employSubstitution(self.getEquation(index), step.substitution),
+                    derivations.SUBSTITUTION, (index,), exact=True)
+        if step.reverse:
+            index = self.addEquation(equations.employSymmetry(self.getEquation(index)), derivations.SYMMETRY, (index,), exact=True)
+        
+        # Apply the function symbols above the rewritten subterm, innermost first
+        for depth in range(len(step.position) - 1, -1, -1):
+            parent = terms.subtermAt(step.source, step.position[:depth])
+            premises = []
+            for i, argument in enumerate(parent.arguments):
+                if i == step.position[depth]:
+                    premises.append(index)
+                else:
+                    if argument not in reflexivity:
+                        reflexivity[argument] = self.addEquation(equations.employReflexivity(argument), derivations.REFLEXIVITY, exact=True)
+                    premises.append(reflexivity[argument])
+        
+            index = self.addEquation(equations.employCongruence(parent.function_name, *map(self.getEquation, premises)),
+                    derivations.CONGRUENCE, premises, exact=True)
+        
+        return index
+    
+    def do_model(self, arg):
+        """Load a finite model from a JSON file, or check in which of the specified equations
+        it is a counterexample to. The values of the variables are listed for the first
+        assignment found where the sides differ.
+        
+        > model load z2.json
+        -- Loaded a model with 2 elements
+        > enter *(:x, :y) *(:y, :x) *(:x, :y) :x
+        @1: *(:x, :y) <=> *(:y, :x)
+        @2: *(:x, :y) <=> :x
+        > model check @1 @2
+        -- @1 holds in the model
+        -- @2 fails in the model for x=0 y=1: 1 != 0
+        """
+        command, _, rest = arg.strip().partition(' ')
+        if command == 'load':
+            if not self.checkFileAccess():
+                return
+            
+            try:
+                self.model = models.load(rest.strip())
+            except (OSError, models.ModelError) as e:
+                self.printError(e)
+                return
+        
+            self.printMessage("Loaded a model with %d elements" % self.model.size)
+        
+        elif command == 'check':
+            if self.model is None:
+                self.printError("No model is loaded")
+                return
+        
+            try:
+                references = equationparser.Parser(rest).parseReferences()
+            except equationparser.ParseError as e:
+                self.printError(e)
+                return
+        
+            for index in references:
+                equation = self.getEquation(index)
+                if not equation:
+                    continue
+        
+                try:
+                    counterexample = self.model.counterexample(equation)
+                except models.ModelError as e:
+                    self.printError("@%d: %s" % (index, e))
+                    continue
+        
+                if counterexample is None:
+                    self.printMessage("@%d holds in the model" % index)
+                else:
+                    values, leftValue, rightValue = counterexample
+                    assignment = "".join(" %s=%d" % item for item in sorted(values.items()))
+                    self.printMessage("@%d fails in the model%s: %d != %d" % (index,
+                            " for" + assignment if assignment else "", leftValue, rightValue))
+        
+        else:
+            self.printError("Expected \"load\" or \"check\"")
+    
+    def do_signature(self, arg):
+        """Declare the arities of function symbols, show the declared arities, or check
+        the specified or all equations against them. Once arities are declared, new
+        equations with undeclared function symbols or wrong numbers of arguments are reported.
+        
+        > signature * 2 -1 1 e 0
+        -- *: 2, -1: 1, e: 0
+        > enter *(e, :x) :x *(-1(:x, :y), :x) e
+        @1: *(e, :x) <=> :x
+        @2: *(-1(:x, :y), :x) <=> e
+        -- @2 doesn't match the signature: -1 is applied to 2 arguments instead of 1
+        > signature check
+        -- @2 doesn't match the signature: -1 is applied to 2 arguments instead of 1
+        -- 1 of 2 equations match the signature
+        """
+        command, _, rest = arg.strip().partition(' ')
+        if command == 'check':
+            if self.signature is None:
+                self.printError("No signature is declared")
+                return
+            
+            try:
+                references = equationparser.Parser(rest).parseReferences()
+            except equationparser.ParseError as e:
+                self.printError(e)
+                return
+            
+            matching = 0
+            for index in references or range(1, len(self.equations) + 1):
+                equation = self.getEquation(index)
+                if not equation:
+                    continue
+                
+                violation = self.signatureViolation(equation)
+                if violation:
+                    self.printError("@%d doesn't match the signature: %s" % (index, self.formatTerm(violation)))
+                else:
+                    matching += 1
+            
+            self.printMessage("%d of %d equations match the signature" % (matching, len(references) or len(self.equations)))
+            return
+        
+        if arg.strip():
+            try:
+                p = equationparser.Parser(arg)
+                arities = dict(self.signature.declared) if self.signature else {}
+                p.skipWhitespace()
+                name = p.parseFunctionSymbol(sourceMayEmpty=True)
+                while name:
+                    arity = p.parseInt()
+                    if arity is None:
+                        raise equationparser.ParseError("Expected the arity of %s at %i" % (name, p.pos), p.pos)
+                    arities[name] = arity
+                    p.skipWhitespace()
+                    name = p.parseFunctionSymbol(sourceMayEmpty=True)
+            except equationparser.ParseError as e:
+                self.printError(e)
+                return
+            
+            # Signatures aren't modified, so the results cached on the terms stay valid
+            self.signature = terms.Signature(arities)
+        
+        if self.signature is None:
+            self.printMessage("No signature is declared")
+        else:
+            self.printMessage(", ".join("%s: %d" % item for item in self.signature.declared.items()))
+    
+    def do_dedup(self, arg):
+        """Choose whether new equations equal to known ones are added again. Equal
+        equations are identical, equal up to renaming of variables ("variants"), and
+        optionally up to exchanging the sides ("symmetric"). Instead of a duplicate,
+        the known equation is printed and used.
+        
+        > dedup variants symmetric
+        -- Equations are deduplicated up to renaming of variables and exchanging the sides
+        > enter *(e, :x) :x :y *(e, :y)
+        @1: *(e, :x) <=> :x
+        @1: *(e, :x) <=> :x
+        > dedup off
+        -- Equations aren't deduplicated
+        """
+        words = arg.split()
+        if words and words[0] in ('off', 'exact', 'variants') and set(words[1:]) <= {'symmetric'} and \
+                not (words[0] == 'off' and len(words) > 1):
+            self.deduplication = None if words[0] == 'off' else words[0]
+            self.deduplicateSymmetric = 'symmetric' in words
+        elif words:
+            self.printError("Expected \"off\", \"exact\" or \"variants\", optionally followed by \"symmetric\"")
+            return
+        
+        if self.deduplication is None:
+            self.printMessage("Equations aren't deduplicated")
+        else:
+            self.printMessage("Equations are deduplicated %s%s" % (
+                    "up to renaming of variables" if self.deduplication == 'variants' else "if they are identical",
+                    " and exchanging the sides" if self.deduplicateSymmetric else ""))
+    
+    def do_lookup(self, arg):
+        """Find the known equations equal to the entered one, up to renaming of variables
+        and exchanging the sides. This takes time proportional to the size of the equation.
+        
+        > enter *(e, :x) :x
+        @1: *(e, :x) <=> :x
+        > lookup :y *(e, :y)
+        @1: *(e, :x) <=> :x
+        > lookup *(e, e) e
+        -- No equal equation is known
+        """
+        try:
+            p = equationparser.Parser(arg)
+            left = p.parseTerm()
+            right = p.parseTerm()
+        except equationparser.ParseError as e:
+            self.printError(e)
+            return
+        
+        found = self.findEquations((left, right), True, True)
+        if not found:
+            self.printMessage("No equal equation is known")
+        for index in found:
+            self.printEquation(index)
+    
+    def do_stats(self, arg):
+        """Record where the time of the session goes, and show the statistics. Recording
+        is off unless it is turned on. The statistics can be written as JSON to a file,
+        or printed if no file is given.
+        
+        > stats on
+        -- Recording statistics
+        > enter *(e, :x) :x
+        @1: *(e, :x) <=> :x
+        > reverse 1
+        @2: :x <=> *(e, :x)
+        > stats
+        command           calls    seconds      ms/call
+        enter                 1      0.000        0.048
+        reverse               1      0.000        0.030
+        rule              calls    seconds      ms/call
+        sym                   1      0.000        0.002
+        parser: 11 bytes in 0.000 s (132027 bytes/s)
+        terms: 3 nodes allocated, 5 reused (62.5% reused)
+        peaks: 2 equations, 3 interned terms
+        > stats json stats.json
+        -- Wrote the statistics to stats.json
+        """
+        command, _, rest = arg.strip().partition(' ')
+        if command == 'on':
+            if self.statistics is None:
+                self.statistics = instrumentation.Statistics()
+            self.printMessage("Recording statistics")
+        elif command == 'off':
+            self.statistics = None
+            self.printMessage("Stopped recording statistics")
+        elif command == 'reset':
+            self.statistics = instrumentation.Statistics()
+            self.printMessage("Recording fresh statistics")
+        elif self.statistics is None:
+            self.printError("Statistics aren't recorded. Start with: > stats on")
+        elif command == 'json':
+            if not rest.strip():
+                self.statistics.dump(self.stdout)
+                return
+            if not self.checkFileAccess():
+                return
+            try:
+                with open(rest.strip(), 'w') as f:
+                    self.statistics.dump(f)
+            except OSError as e:
+                self.printError(e)
+                return
+            self.printMessage("Wrote the statistics to %s" % rest.strip())
+        elif not command:
+            self.statistics.report(self.stdout)
+        else:
+            self.printError("Expected \"on\", \"off\", \"reset\" or \"json\"")
+    
+    def do_proof(self, arg):
+        """Print the proof tree of an equation. Each step is printed once, after all
+        the steps it depends on, together with the rule and the premises it was derived by.
+        
+        > enter *(-(e), e) e e *(e, e)
+        @1: *(-(e), e) <=> e
+        @2: e <=> *(e, e)
+        > combine 1 2
+        @3: *(-(e), e) <=> *(e, e)
+        > reverse 3
+        @4: *(e, e) <=> *(-(e), e)
+        > proof @4
+        @1: *(-(e), e) <=> e    (axiom)
+        @2: e <=> *(e, e)    (axiom)
+        @3: *(-(e), e) <=> *(e, e)    (trans @1 @2)
+        @4: *(e, e) <=> *(-(e), e)    (sym @3)
+        """
+        try:
+            p = equationparser.Parser(arg)
+            references = p.parseReferences()
+        except equationparser.ParseError as e:
+            self.printError(e)
+            return
+        
+        for reference in references:
+            if not self.getEquation(reference):
+                continue
+            
+            for index in self.derivations.dependencies(reference):
+                left, right = self.equations[index-1]
+                print("@%d: %s <=> %s    (%s)" % (index, self.formatTerm(left), self.formatTerm(right),
+                        self.derivations.describe(index)), file=self.stdout)
     
     def getEquation(self, index):
         try:
+            if index < 1:
+                raise IndexError()
             return self.equations[index-1]
         except IndexError:
             self.printError("The referenced equation @%i doesn't exist" % index)
             return None
     
-    def addEquation(self, equation):
+    def do_save(self, arg):
+        """Save all equations and their derivations to a file.
+        
+        > save group.session
+        -- Saved 3 equations to group.session
+        """
+        if not self.checkFileAccess():
+            return
+        
+        try:
+            sessionfile.save(arg.strip(), self.equations, self.derivations)
+        except OSError as e:
+            self.printError(e)
+            return
+        
+        self.printMessage("Saved %d equations to %s" % (len(self.equations), arg.strip()))
+    
+    def do_load(self, arg):
+        """Replace all equations by those saved to a file.
+        The equations are only read from the file as they are used.
+        
+        > load group.session
+        -- Loaded 3 equations from group.session
+        """
+        if not self.checkFileAccess():
+            return
+        
+        try:
+            self.equations, self.derivations = sessionfile.load(arg.strip())
+        except (OSError, sessionfile.SessionFileError) as e:
+            self.printError(e)
+            return
+        
+        self.resetIndexes()
+        self.printMessage("Loaded %d equations from %s" % (len(self.equations), arg.strip()))
+    
+    def checkFileAccess(self):
+        """Return whether commands may access files, and report an error if not."""
+        if not self.fileAccess:
+            self.printError("Files can't be accessed in this session")
+        return self.fileAccess
+    
+    def resetIndexes(self):
+        # Both sides of all equations, mapped to the equations' indizes
+        self.index = termindex.DiscriminationTree()
+        
+        # Decides which ground equations follow from the known equations
+        self.closure = congruence.CongruenceClosure()
+        
+        # The number of equations added to the index and the closure. Loaded
+        # equations are only added when the index or the closure is used.
+        self.indexed = 0
+        
+        # Rewrite systems of recent normalize commands, by the references to their rules.
+        # They are kept to reuse the normal forms they have cached.
+        self.rewriteSystems = {}
+        
+        # Maps the equations with canonically renamed variables to their indizes
+        self.contents = {}
+    
+    def updateIndexes(self):
+        while self.indexed < len(self.equations):
+            equation = self.equations[self.indexed]
+            self.indexed += 1
+            self.index.insert(equation[0], self.indexed)
+            self.index.insert(equation[1], self.indexed)
+            self.closure.merge(equation)
+            self.contents.setdefault(terms.canonical(*equation), []).append(self.indexed)
+    
+    def findEquations(self, equation, variants=False, symmetric=False):
+        """Return the indizes of the known equations equal to `equation`, optionally
+        up to renaming of variables or exchanging the sides."""
+        self.updateIndexes()
+        left, right = equation
+        found = set()
+        for orientation in ((left, right), (right, left)) if symmetric else ((left, right),):
+            for index in self.contents.get(terms.canonical(*orientation), ()):
+                if variants or self.getEquation(index) == orientation:
+                    found.add(index)
+        
+        return sorted(found)
+    
+    def findGeneralizations(self, term):
+        """Return the indizes of the equations with a side which `term` is an instance of."""
+        self.updateIndexes()
+        return set(self.index.generalizations(term))
+    
+    def findInstances(self, term):
+        """Return the indizes of the equations with a side which is an instance of `term`."""
+        self.updateIndexes()
+        return set(self.index.instances(term))
+    
+    def getRewriteSystem(self, references):
+        key = tuple(references)
+        system = self.rewriteSystems.get(key)
+        if system:
+            return system
+        
+        equations_ = tuple(filter(bool, map(self.getEquation, references)))
+        if len(equations_) != len(references):
+            # In this case, some equations don't exist
+            return None
+        
+        system = rewriting.RewriteSystem()
+        for reference, (left, right) in zip(references, equations_):
+            try:
+                system.addRule(left, right)
+            except rewriting.RewriteError as e:
+                self.printError("@%d: %s" % (reference, e))
+                return None
+        
+        if len(self.rewriteSystems) >= 16:
+            self.rewriteSystems.clear()
+        self.rewriteSystems[key] = system
+        return system
+    
+    def addEquation(self, equation, rule=derivations.AXIOM, premises=(), exact=False):
+        """Add an equation, which was derived from the equations referenced by
+        `premises` by the inference rule `rule`, to the known equations.
+        Returns its index, or that of an equal known equation if duplicates are
+        avoided. `exact` restricts those to identical equations, for steps which
+        other steps rely on literally."""
+        if self.deduplication is not None:
+            found = self.findEquations(equation, self.deduplication == 'variants' and not exact,
+                    self.deduplicateSymmetric and not exact)
+            if found:
+                if self.echo:
+                    self.printEquation(found[0])
+                return found[0]
+        
         self.equations.append(equation)
-        self.printEquation(len(self.equations))
+        self.derivations.add(rule, premises)
+        if self.indexed == len(self.equations) - 1:
+            self.updateIndexes()
+        if self.echo:
+            self.printEquation(len(self.equations))
+        if self.signature is not None:
+            violation = self.signatureViolation(equation)
+            if violation:
+                self.printError("@%d doesn't match the signature: %s" % (len(self.equations), self.formatTerm(violation)))
         return len(self.equations)
     
-    def printEquation(self, index):
-        left, right = self.getEquation(index)
-        print("@%d: %s <=> %s" % (index, left, right), file=self.stdout)
+    def signatureViolation(self, equation):
+        """Describe why the equation doesn't match the declared signature, or return None."""
+        for side in equation:
+            application = self.signature.violation(side)
+            if application is not None:
+                arity = self.signature.arity(application.function_name)
+                if arity is None:
+                    return "%s isn't declared" % application.function_name
+                return "%s is applied to %d arguments instead of %d" % (application.function_name, len(application.arguments), arity)
+        
+        return None
+    
+    def printEquation(self, index, maxDepth=None):
+        """Print an equation, abbreviating arguments nested deeper than `maxDepth`."""
+        equation = self.getEquation(index)
+        if not equation:
+            return
+        
+        left, right = equation
+        self.stdout.write("@%d: " % index)
+        terms.writeTerm(left, self.stdout, maxDepth, self.maxTermLength)
+        self.stdout.write(" <=> ")
+        terms.writeTerm(right, self.stdout, maxDepth, self.maxTermLength)
+        self.stdout.write("\n")
+    
+    def formatTerm(self, term):
+        """Render a term, cut off after `maxTermLength` characters."""
+        if self.maxTermLength is None:
+            return str(term)
+        
+        out = io.StringIO()
+        terms.writeTerm(term, out, maxLength=self.maxTermLength)
+        return out.getvalue()
     
     def printError(self, message):
+        self.errorCount += 1
+        if self.firstError is None:
+            self.firstError = str(message)
         print("-- %s" % message, file=self.stdout)
+    
+    def default(self, line):
+        self.printError("Unknown command: %s" % line)
+    
+    def onecmd(self, line):
+        statistics = self.statistics
+        if statistics is None:
+            return cmd.Cmd.onecmd(self, line)
+        
+        # The instrumented modules record into this session's statistics while
+        # the command runs
+        previous = instrumentation.activate(statistics)
+        start = time.perf_counter()
+        try:
+            return cmd.Cmd.onecmd(self, line)
+        finally:
+            statistics.recordCommand(self.parseline(line)[0] or line.strip(), time.perf_counter() - start)
+            statistics.recordSizes(len(self.equations))
+            instrumentation.activate(previous)
+    
+    def printMessage(self, message):
+        print("-- %s" % message, file=self.stdout)
+    
+    def runScript(self, lines):
+        """Execute the commands in `lines` one after another, without prompting.
+        Empty lines and lines starting with "#" are skipped, "exit" ends the script.
+        An unexpected exception in a command is reported as its error, and the
+        script continues with the next line.
+        Returns a mapping from command names to the number of their invocations
+        and the total time spent in them."""
+        timings = {}
+        for number, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            
+            name = self.parseline(line)[0]
+            self.firstError = None
+            start = time.perf_counter()
+            try:
+                stop = self.onecmd(line)
+            except Exception as e:
+                self.printError("%s: %s" % (type(e).__name__, e))
+                stop = False
+            elapsed = time.perf_counter() - start
+            
+            if self.firstError is not None and self.failure is None:
+                self.failure = (number, line, self.firstError)
+            
+            timing = timings.setdefault(name, [0, 0.0])
+            timing[0] += 1
+            timing[1] += elapsed
+            
+            if stop:
+                break
+        
+        return timings
+
+def printTimings(timings, file):
+    count = sum(timing[0] for timing in timings.values())
+    seconds = sum(timing[1] for timing in timings.values())
+    
+    print("%d commands in %.3f s (%.1f commands/s)" % (count, seconds, count / seconds if seconds else 0.0), file=file)
+    for name, (count, seconds) in sorted(timings.items(), key=lambda item: -item[1][1]):
+        print("  %-10s %8d calls %10.3f s %12.1f calls/s" % (name, count, seconds, count / seconds if seconds else 0.0), file=file)
 
 if __name__ == '__main__':
     import sys
-    intro = """Welcome to the equational calculator. You may enter equations and use the inference rules of equational reasoning on them."""
-    Calculator(sys.stdin, sys.stdout).cmdloop(intro)
\ No newline at end of file
+    
+    argumentParser = argparse.ArgumentParser(description="The equational calculator")
+    argumentParser.add_argument('--script', help="execute the commands in this file instead of reading them interactively")
+    output = argumentParser.add_mutually_exclusive_group()
+    output.add_argument('--quiet', action='store_true', help="don't print derived equations, only errors")
+    output.add_argument('--only-final', action='store_true', help="only print the last equation after the script has finished")
+    argumentParser.add_argument('--stats', action='store_true', help="record statistics and print them to stderr on exit")
+    argumentParser.add_argument('--profile', choices=('cpu', 'memory'),
+            help="profile the session with cProfile or tracemalloc and write a report on exit")
+    argumentParser.add_argument('--profile-output', metavar='PATH', help="write the profile report to this file instead of stderr")
+    arguments = argumentParser.parse_args()
+    
+    if arguments.profile == 'cpu':
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    elif arguments.profile == 'memory':
+        import tracemalloc
+        tracemalloc.start()
+    
+    if arguments.script:
+        # Writing each line on its own is slow for long scripts. The output is
+        # buffered in large chunks instead, which are flushed when full and when
+        # the script ends, even if it crashes, so at most one chunk is lost.
+        sys.stdout.flush()
+        output = open(sys.stdout.fileno(), 'w', buffering=1 << 20, encoding=sys.stdout.encoding,
+                errors=sys.stdout.errors, closefd=False)
+        calculator = Calculator(sys.stdin, output)
+        calculator.echo = not (arguments.quiet or arguments.only_final)
+        if arguments.stats:
+            calculator.statistics = instrumentation.Statistics()
+        
+        try:
+            with open(arguments.script) as script:
+                timings = calculator.runScript(script)
+            
+            if arguments.only_final and calculator.equations:
+                calculator.printEquation(len(calculator.equations))
+        finally:
+            output.flush()
+        
+        printTimings(timings, sys.stderr)
+    
+    else:
+        intro = """Welcome to the equational calculator. You may enter equations and use the inference rules of equational reasoning on them."""
+        calculator = Calculator(sys.stdin, sys.stdout)
+        if arguments.stats:
+            calculator.statistics = instrumentation.Statistics()
+        calculator.cmdloop(intro)
+    
+    if arguments.profile is not None:
+        report = open(arguments.profile_output, 'w') if arguments.profile_output else sys.stderr
+        if arguments.profile == 'cpu':
+            import pstats
+            profiler.disable()
+            pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(30)
+        else:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print("%d bytes allocated, %d at the peak" % (current, peak), file=report)
+            for statistic in snapshot.statistics('lineno')[:20]:
+                print(statistic, file=report)
+        if report is not sys.stderr:
+            report.close()
+    
+    if calculator.statistics is not None:
+        calculator.statistics.report(sys.stderr)
\ No newline at end of file
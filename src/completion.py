@@ -0,0 +1,219 @@
+"""Knuth-Bendix completion of a set of equations to a convergent rewrite system.
+
+Equations are taken from a priority queue, smallest first, reduced to normal
+form with the rules found so far and oriented into a new rule by a
+lexicographic path order. The new rule is used to simplify the existing rules
+(interreduction), and its overlaps with them yield new equations, the critical
+pairs. The overlaps are found with term indexes over the left sides of the
+rules and over their subterms. If the queue runs empty, the rules are convergent
+and decide the equational theory of the input."""
+
+import rewriting
+import termindex
+import terms
+
+import heapq
+import itertools
+import time
+
+class CompletionError(Exception):
+    pass
+
+class LexicographicPathOrder(object):
+    """A lexicographic path order. Function symbols are compared by their rank
+    in the precedence, which is computed once per symbol and cached.
+
+    The symbols listed in `order` are greatest, in the given order. Of the other
+    symbols, unary ones are greater than those of higher arity, and constants are
+    least, which suits operations like the inverse of a group."""
+
+    def __init__(self, order=()):
+        self.precedence = {}
+        for position, name in enumerate(reversed(order)):
+            self.precedence[name] = (3, position)
+        self.comparisons = {}
+
+    def rank(self, term):
+        rank = self.precedence.get(term.function_name)
+        if rank is None:
+            arity = len(term.arguments)
+            rank = (2 if arity == 1 else 1 if arity else 0, term.function_name)
+            self.precedence[term.function_name] = rank
+        return rank
+
+    def greater(self, term1, term2):
+        """Whether `term1` is greater than `term2`."""
+        key = (term1, term2)
+        result = self.comparisons.get(key)
+        if result is None:
+            result = self.comparisons[key] = self.compare(term1, term2)
+        return result
+
+    def compare(self, term1, term2):
+        if isinstance(term1, terms.Variable) or term1 is term2:
+            return False
+        if isinstance(term2, terms.Variable):
+            # Greater than the variables occurring in it
+            return term2.name in term1.variables()
+        if not term2.variables() <= term1.variables():
+            return False
+
+        if any(argument is term2 or self.greater(argument, term2) for argument in term1.arguments):
+            return True
+
+        rank1, rank2 = self.rank(term1), self.rank(term2)
+        if rank1 > rank2:
+            return all(self.greater(term1, argument) for argument in term2.arguments)
+        if rank1 < rank2:
+            return False
+
+        for argument1, argument2 in zip(term1.arguments, term2.arguments):
+            if argument1 is not argument2:
+                return self.greater(argument1, argument2) and \
+                        all(self.greater(term1, argument) for argument in term2.arguments)
+
+        return len(term1.arguments) > len(term2.arguments)
+
+def size(term):
+    """The number of symbols in the term written out as a tree."""
+    result = 0
+    stack = [term]
+    while stack:
+        term = stack.pop()
+        result += 1
+        if isinstance(term, terms.Application):
+            stack.extend(term.arguments)
+    return result
+
+def renameApart(left, right):
+    """Rename the variables of a rule, so they differ from those of rules renamed by `terms.canonical`."""
+    substitution = {name: terms.Variable(name + '_') for name in left.variables()}
+    return left.substitute(substitution), right.substitute(substitution)
+
+class Completion(object):
+    def __init__(self, equations, order=None, maxSteps=10000, timeLimit=None,
+            progress=None, progressInterval=1000):
+        self.order = order or LexicographicPathOrder()
+        self.maxSteps = maxSteps
+        self.timeLimit = timeLimit
+        # Called with the statistics every `progressInterval` steps
+        self.progress = progress
+        self.progressInterval = progressInterval
+
+        # Rule ids are those of the rewrite system, whose index of the left sides is shared
+        self.system = rewriting.RewriteSystem()
+        # Maps the subterms of the left sides to pairs of rule ids and positions
+        self.subterms = termindex.DiscriminationTree()
+
+        self.queue = []
+        self.counter = itertools.count()
+        self.statistics = {
+            'steps': 0,
+            'rules': 0,
+            'removed': 0,
+            'critical pairs': 0,
+            'joinable': 0,
+            'seconds': 0.0,
+        }
+
+        for left, right in equations:
+            self.push(left, right)
+
+    def push(self, left, right):
+        heapq.heappush(self.queue, (size(left) + size(right), next(self.counter), left, right))
+
+    def rules(self):
+        return [rule for rule in self.system.rules if rule is not None]
+
+    def run(self):
+        """Complete the equations and return the rules. Raises a CompletionError
+        if an equation can't be oriented or a limit is exceeded."""
+        start = time.perf_counter()
+        statistics = self.statistics
+        try:
+            while self.queue:
+                if statistics['steps'] >= self.maxSteps:
+                    raise CompletionError("Not completed after %d steps" % self.maxSteps)
+                if self.timeLimit is not None and time.perf_counter() - start > self.timeLimit:
+                    raise CompletionError("Not completed after %g seconds" % self.timeLimit)
+
+                statistics['steps'] += 1
+                if self.progress and statistics['steps'] % self.progressInterval == 0:
+                    statistics['seconds'] = time.perf_counter() - start
+                    self.progress(statistics, len(self.queue))
+
+                _, _, left, right = heapq.heappop(self.queue)
+                self.step(left, right)
+
+        except rewriting.RewriteError as e:
+            raise CompletionError(str(e))
+        finally:
+            statistics['seconds'] = time.perf_counter() - start
+
+        return self.rules()
+
+    def step(self, left, right):
+        left, right = self.system.normalize(left), self.system.normalize(right)
+        if left is right:
+            self.statistics['joinable'] += 1
+            return
+
+        if self.order.greater(right, left):
+            left, right = right, left
+        elif not self.order.greater(left, right):
+            raise CompletionError("Can't orient %s <=> %s" % (left, right))
+
+        left, right = terms.canonical(left, right)
+        rule = self.system.addRule(left, right)
+        self.statistics['rules'] += 1
+        self.interreduce(rule)
+        for position, subterm in terms.positions(left):
+            self.subterms.insert(subterm, (rule, position))
+        self.addCriticalPairs(rule)
+
+    def interreduce(self, rule):
+        left, right = self.system.rules[rule]
+
+        # Rules whose left side is reducible by the new rule become equations again
+        for other, _ in self.subterms.instances(left):
+            if other != rule and self.system.rules[other] is not None:
+                self.push(*self.system.rules[other])
+                self.system.removeRule(other)
+                self.statistics['removed'] += 1
+
+        # The right sides are kept in normal form
+        for other, otherRule in enumerate(self.system.rules):
+            if otherRule is None or other == rule:
+                continue
+            otherLeft, otherRight = otherRule
+            normalForm = self.system.normalize(otherRight)
+            if normalForm is not otherRight:
+                self.system.removeRule(other)
+                replacement = self.system.addRule(otherLeft, normalForm)
+                for position, subterm in terms.positions(otherLeft):
+                    self.subterms.insert(subterm, (replacement, position))
+
+    def addCriticalPairs(self, rule):
+        left, right = renameApart(*self.system.rules[rule])
+
+        # Overlaps of other rules into the left side of the new rule,
+        # including overlaps of the new rule into itself
+        for position, subterm in terms.positions(left):
+            for other, substitution in self.system.index.unifiable(subterm):
+                if self.system.rules[other] is None or (other == rule and not position):
+                    continue
+                otherRight = self.system.rules[other][1]
+                self.addCriticalPair(terms.replace(left, position, otherRight), right, substitution)
+
+        # Overlaps of the new rule into the left sides of other rules
+        for (other, position), substitution in self.subterms.unifiable(left):
+            if other == rule or self.system.rules[other] is None:
+                continue
+            otherLeft, otherRight = self.system.rules[other]
+            self.addCriticalPair(terms.replace(otherLeft, position, right), otherRight, substitution)
+
+    def addCriticalPair(self, left, right, substitution):
+        self.statistics['critical pairs'] += 1
+        left, right = left.substitute(substitution), right.substitute(substitution)
+        if left is not right:
+            self.push(left, right)
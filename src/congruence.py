@@ -0,0 +1,111 @@
+"""Congruence closure to decide which equalities between terms follow from a set of
+equations when their variables are treated as constants.
+
+The terms are partitioned into classes of equal terms by a union-find structure.
+A signature table maps each function symbol together with the classes of the
+arguments to an application, so congruent applications are found in constant
+time whenever two classes are merged."""
+
+import terms
+
+class CongruenceClosure(object):
+    def __init__(self):
+        # Maps each known term to its parent in the union-find forest.
+        # Representatives of the classes are their own parents.
+        self.parent = {}
+
+        # Maps each representative to the applications with an argument in its class
+        self.uses = {}
+
+        # Maps function symbols and representatives of arguments to an application
+        self.signatures = {}
+
+    def find(self, term):
+        root = term
+        parent = self.parent
+        while parent[root] is not root:
+            root = parent[root]
+
+        # Path compression
+        while term is not root:
+            parent[term], term = root, parent[term]
+
+        return root
+
+    def signature(self, application):
+        return (application.function_name,) + tuple(map(self.find, application.arguments))
+
+    def add(self, term):
+        """Make the term and all its subterms known to the closure."""
+        if term in self.parent:
+            return
+
+        stack = [(term, False)]
+        while stack:
+            term, argumentsAdded = stack.pop()
+            if term in self.parent:
+                continue
+
+            if isinstance(term, terms.Application) and not argumentsAdded:
+                stack.append((term, True))
+                stack.extend((argument, False) for argument in term.arguments if argument not in self.parent)
+                continue
+
+            self.parent[term] = term
+            self.uses[term] = []
+            if isinstance(term, terms.Variable):
+                continue
+
+            for representative in set(map(self.find, term.arguments)):
+                self.uses[representative].append(term)
+
+            signature = self.signature(term)
+            congruent = self.signatures.get(signature)
+            if congruent is None:
+                self.signatures[signature] = term
+            else:
+                self.union(term, congruent)
+
+    def union(self, term1, term2):
+        """Merge the classes of two known terms and all classes which become
+        congruent because of that."""
+        pending = [(term1, term2)]
+        while pending:
+            term1, term2 = pending.pop()
+            root1, root2 = self.find(term1), self.find(term2)
+            if root1 is root2:
+                continue
+
+            # The class with less uses is merged into the other one,
+            # as the signatures of all its uses have to be updated.
+            if len(self.uses[root1]) > len(self.uses[root2]):
+                root1, root2 = root2, root1
+
+            uses = self.uses.pop(root1)
+            for application in uses:
+                signature = self.signature(application)
+                if self.signatures.get(signature) is application:
+                    del self.signatures[signature]
+
+            self.parent[root1] = root2
+
+            for application in uses:
+                signature = self.signature(application)
+                congruent = self.signatures.setdefault(signature, application)
+                if congruent is not application:
+                    pending.append((application, congruent))
+
+            self.uses[root2].extend(uses)
+
+    def merge(self, equation):
+        """Assume that both sides of the equation are equal."""
+        left, right = equation
+        self.add(left)
+        self.add(right)
+        self.union(left, right)
+
+    def equal(self, term1, term2):
+        """Whether the terms are equal according to the merged equations."""
+        self.add(term1)
+        self.add(term2)
+        return self.find(term1) is self.find(term2)
@@ -0,0 +1,63 @@
+"""Records how each equation was derived, to print proof trees.
+
+The records are kept in flat arrays instead of one object per step: one column
+holds the inference rules, and the premises of all steps are stored one after
+another, delimited by a column of end offsets. Equations are numbered from 1,
+like the references to them."""
+
+import array
+
+AXIOM = 0
+REFLEXIVITY = 1
+SYMMETRY = 2
+TRANSITIVITY = 3
+CONGRUENCE = 4
+SUBSTITUTION = 5
+# Rewriting to normal form with the premises as rewrite rules
+REWRITING = 6
+# Knuth-Bendix completion of the premises
+COMPLETION = 7
+
+ruleNames = ('axiom', 'refl', 'sym', 'trans', 'cong', 'subst', 'rewrite', 'complete')
+
+class DerivationStore(object):
+    def __init__(self):
+        self.rules = array.array('B')
+        self.premiseEnds = array.array('q')
+        self.premises = array.array('q')
+
+    def __len__(self):
+        return len(self.rules)
+
+    def add(self, rule, premises=()):
+        """Record the next derivation step. The premises have to be recorded already."""
+        self.rules.append(rule)
+        self.premises.extend(premises)
+        self.premiseEnds.append(len(self.premises))
+        return len(self.rules)
+
+    def rule(self, index):
+        return self.rules[index - 1]
+
+    def premisesOf(self, index):
+        start = self.premiseEnds[index - 2] if index > 1 else 0
+        return self.premises[start:self.premiseEnds[index - 1]]
+
+    def dependencies(self, index):
+        """Return the indizes of all steps the equation at `index` depends on,
+        including itself, in ascending order.
+
+        As premises always precede the steps using them, a single backwards sweep
+        over the steps finds all of them."""
+        marks = bytearray(index + 1)
+        marks[index] = 1
+        for step in range(index, 0, -1):
+            if marks[step]:
+                for premise in self.premisesOf(step):
+                    marks[premise] = 1
+
+        return [step for step in range(1, index + 1) if marks[step]]
+
+    def describe(self, index):
+        """Return the rule and premises of a step in a readable form, like "trans @1 @2"."""
+        return " ".join([ruleNames[self.rule(index)]] + ["@%d" % premise for premise in self.premisesOf(index)])
@@ -1,90 +1,185 @@
 import terms
 
+import codecs
+import io
+import mmap
+import os
 import re
+import time
 
 argumentSeparatorRegex = re.compile(r',\s*')
+bindingRegex = re.compile(r':?(\w+)\s*')
 closingParentheseRegex = re.compile(r'\)\s*')
 equalitySignRegex = re.compile(r'\s*=')
 intRegex = re.compile(r'\s*(\d+)')
 openingParentheseRegex = re.compile(r'\(\s*')
 referenceRegex = re.compile(r'\s*@(\d+)')
+referenceListRegex = re.compile(r'\s*@?(\d+)')
 symbolRegex = re.compile(r'([^,()\[\]\s]+)\s*')
 variableRegex = re.compile(r':(\w+)\s*')
 whitespaceRegex = re.compile(r'\s*')
 
+# Matches any single token of the term syntax, including leading whitespace.
+# The alternatives are tried in order, so variables take precedence over symbols.
+# A function symbol directly followed by an opening parenthese is a single token.
+# Every other character is a token on its own, so tokens are always contiguous.
+tokenRegex = re.compile(r'''\s*(?:
+      :(?P<variable>\w+)
+    | (?P<call>[^,()\[\]\s]+)\s*\(
+    | (?P<symbol>[^,()\[\]\s]+)
+    | (?P<open>\()
+    | (?P<close>\))
+    | (?P<separator>,)
+    | (?P<invalid>\S)
+    )''', re.VERBOSE)
+
+# Variants of the term syntax to parse bytes-like sources, like memory-mapped files.
+# Their character classes are ASCII-only, so they only agree with the patterns
+# above on sources without any of the bytes matched by `nonPortableBytesRegex`.
+tokenBytesRegex = re.compile(tokenRegex.pattern.encode('ascii'), re.VERBOSE)
+whitespaceBytesRegex = re.compile(whitespaceRegex.pattern.encode('ascii'))
+nonPortableBytesRegex = re.compile(rb'[\x1c-\x1f\x80-\xff]')
+
+# The statistics of `instrumentation` while it is enabled
+statistics = None
+
 class ParseError(Exception):
-    def __init__(self, message):
+    def __init__(self, message, position=None):
         Exception.__init__(self, message)
+        self.position = position
 
 class Parser(object):
-    def __init__(self, src, begin=0):
+    """Parses terms and the other syntactic elements of commands from `src`.
+    
+    `parseTerm` also accepts bytes-like sources; positions are then byte offsets.
+    `origin` is the offset of `src` in the whole input and is added to reported positions."""
+    
+    def __init__(self, src, begin=0, origin=0):
         self.src = src
         self.pos = begin
+        self.origin = origin
+        self.binary = not isinstance(src, str)
 
     def parseTerm(self, sourceMayEmpty=False):
-        self.pos = whitespaceRegex.match(self.src, self.pos).end()
-
-        variableMatch = variableRegex.match(self.src, self.pos)
-        if variableMatch:
-            return self.parseVariable(False, variableMatch)
+        """Parse a term starting at the current position.
         
-        symbolMatch = symbolRegex.match(self.src, self.pos)
-        if symbolMatch:
-            return self.parseApplication(False, symbolMatch)
+        The source is tokenized in a single pass and terms are built bottom-up
+        on an explicit stack of unfinished applications, so the nesting depth
+        is only limited by the available memory."""
+        if statistics is None:
+            return self._parseTerm(sourceMayEmpty)
         
-        openingParentheseMatch = openingParentheseRegex.match(self.src, self.pos)
-        if openingParentheseMatch:
-            self.pos = openingParentheseMatch.end()
-            term = self.parseTerm()
-            
-            closingParentheseMatch = closingParentheseRegex.match(self.src, self.pos)
-            if not closingParentheseMatch:
-                raise ParseError("Unexpected symbol at %i, expected a closing parenthese (\")\")" % self.pos)
+        begin, start = self.pos, time.perf_counter()
+        try:
+            return self._parseTerm(sourceMayEmpty)
+        finally:
+            seconds = time.perf_counter() - start
+            # Text sources are measured in bytes of UTF-8 as well
+            length = self.pos - begin
+            if not self.binary:
+                parsed = self.src[begin:self.pos]
+                if not parsed.isascii():
+                    length = len(parsed.encode('utf-8'))
+            statistics.recordParsing(length, seconds)
+    
+    def _parseTerm(self, sourceMayEmpty):
+        binary = self.binary
+        tokens = (tokenBytesRegex if binary else tokenRegex).finditer(self.src, self.pos)
+        next_ = next
+        Application = terms.Application
+        Variable = terms.Variable
         
-            self.pos = closingParentheseMatch.end()
-            return term
+        # The last token consumed. The position after it is only stored when
+        # returning or raising, as nothing reads it in between.
+        last = None
         
-        if sourceMayEmpty:
-            # The fact that there simply is nothing to parse shall be accepted.
-            return None
-        else:
-            raise ParseError("Unexpected symbol at %i, expected a term" % self.pos)
-
-    def parseApplication(self, sourceMayEmpty=False, symbolMatch=None):
-        name = self.parseFunctionSymbol(sourceMayEmpty, symbolMatch)
-        if not name:
-            # The other case won't occur. In this case parseFunctionSymbol would already have thrown a ParseException
-            assert sourceMayEmpty
-            return None
+        # Each entry is a pair of a function symbol and the arguments parsed so far.
+        # A function symbol of None stands for a parenthesized term.
+        stack = []
         
-        openingParentheseMatch = openingParentheseRegex.match(self.src, self.pos)
-        if not openingParentheseMatch:
-            # A function symbol with arity 0 doesn't necessarily has to be followed
-            # by an argument list.
-            self.pos = symbolMatch.end()
-            return terms.Application(name)
-        
-        self.pos = openingParentheseMatch.end()
-        closingParentheseMatch = closingParentheseRegex.match(self.src, self.pos)
-        
-        arguments = []
-        while not closingParentheseMatch:
-            term = self.parseTerm(sourceMayEmpty=False)
-            arguments.append(term)
+        while True:
+            token = next_(tokens, None)
+            kind = token.lastgroup if token else None
             
-            # Parse either an argument separator or a closing parenthese.
-            # If both cannot be found, raise a syntax error.
-            argumentSeparatorMatch = argumentSeparatorRegex.match(self.src, self.pos)
-            if not argumentSeparatorMatch:
-                closingParentheseMatch = closingParentheseRegex.match(self.src, self.pos)
-                if not closingParentheseMatch:
-                    raise ParseError("Unexpected symbol at %i, expected either an argument separator (\",\") or a closing parenthese (\")\")" % self.pos)
+            if kind == 'symbol':
+                # A function symbol with arity 0 doesn't necessarily has to be followed
+                # by an argument list.
+                name = token.group(kind)
+                term = Application(name.decode('utf-8') if binary else name)
+            
+            elif kind == 'variable':
+                name = token.group(kind)
+                term = Variable(name.decode('utf-8') if binary else name)
+            
+            elif kind == 'call':
+                last = token
+                name = token.group(kind)
+                stack.append((name.decode('utf-8') if binary else name, []))
+                continue
+            
+            elif kind == 'open':
+                last = token
+                stack.append((None, []))
+                continue
+            
+            elif kind == 'close' and stack and stack[-1][0] is not None and not stack[-1][1]:
+                # An empty argument list
+                term = Application(stack.pop()[0])
+            
+            elif not stack and sourceMayEmpty:
+                # The fact that there simply is nothing to parse shall be accepted.
+                return None
+            
+            else:
+                self.advance(last)
+                raise self.unexpected("a term")
+            
+            last = token
+            
+            # Hand the finished term up to the enclosing applications, completing
+            # every one of them which is closed right afterwards.
+            while stack:
+                name, arguments = stack[-1]
+                arguments.append(term)
+                
+                token = next_(tokens, None)
+                kind = token.lastgroup if token else None
+                
+                if kind == 'close':
+                    last = token
+                    stack.pop()
+                    if name is not None:
+                        term = Application(name, *arguments)
+                
+                elif kind == 'separator' and name is not None:
+                    last = token
+                    break
+                
+                elif name is None:
+                    self.advance(last)
+                    raise self.unexpected("a closing parenthese (\")\")")
+                
                 else:
-                    self.pos = closingParentheseMatch.end()
+                    self.advance(last)
+                    raise self.unexpected("either an argument separator (\",\") or a closing parenthese (\")\")")
+            
             else:
-                self.pos = argumentSeparatorMatch.end()
-        
-        return terms.Application(name, *arguments)
+                self.advance(last)
+                return term
+    
+    def advance(self, token):
+        """Move the position past a token, if there is one."""
+        if token is not None:
+            self.pos = token.end()
+    
+    def skipWhitespace(self):
+        regex = whitespaceBytesRegex if self.binary else whitespaceRegex
+        self.pos = regex.match(self.src, self.pos).end()
+        return self.pos
+    
+    def unexpected(self, expectation):
+        position = self.origin + self.skipWhitespace()
+        return ParseError("Unexpected symbol at %i, expected %s" % (position, expectation), position)
 
     def parseVariable(self, sourceMayEmpty=False, variableMatch=None):
         if not variableMatch:
@@ -123,6 +218,26 @@ class Parser(object):
         self.pos = referenceMatch.end()
         return int(referenceMatch.group(1))
 
+    def parseKeyword(self, keyword):
+        """Skip the keyword if it follows. Returns whether it did."""
+        self.skipWhitespace()
+        if not self.src.startswith(keyword, self.pos):
+            return False
+        
+        self.pos += len(keyword)
+        return True
+    
+    def parseReferences(self):
+        """Parse a list of references to equations. The leading "@" is optional."""
+        references = []
+        referenceMatch = referenceListRegex.match(self.src, self.pos)
+        while referenceMatch:
+            references.append(int(referenceMatch.group(1)))
+            self.pos = referenceMatch.end()
+            referenceMatch = referenceListRegex.match(self.src, self.pos)
+        
+        return references
+
     def parseInt(self):
         self.pos = whitespaceRegex.match(self.src, self.pos).end()
         
@@ -143,22 +258,173 @@ class Parser(object):
         return references
 
     def parseSubstitution(self, sourceMayEmpty=False):
-        variable = self.parseVariable(sourceMayEmpty)
-        if not variable:
-            # The other case doesn't occur. parseVariable would already have thrown an exception
-            assert sourceMayEmpty
-            return None
+        """Parse the binding of a variable to a term, like `:x=f(:y)`.
+        The colon in front of the variable name may be omitted."""
+        self.skipWhitespace()
+        bindingMatch = bindingRegex.match(self.src, self.pos)
+        if not bindingMatch:
+            if sourceMayEmpty:
+                return None
+            else:
+                raise ParseError("Unexpected symbol at %i, expected a variable name" % self.pos, self.pos)
         
+        self.pos = bindingMatch.end()
         equalitySignMatch = equalitySignRegex.match(self.src, self.pos)
         if not equalitySignMatch:
             raise ParseError("Expected an equality sign at %i (after the variable name)" % self.pos)
         
         self.pos = equalitySignMatch.end()
-        term = terms.parser.parseTerm(False)
-        return (variable.name, term)
+        term = self.parseTerm(False)
+        return (bindingMatch.group(1), term)
 
     def parseTermOrReference(self, sourceMayEmpty=False):
-        reference = parseReference(True)
-        if not reference:
+        reference = self.parseReference(True)
+        if reference is None:
             return self.parseTerm(sourceMayEmpty)
-        return reference
\ No newline at end of file
+        return reference
+
+def iterEquations(source, chunkSize=1 << 16):
+    """Parse equations from `source`, which is either a string, a bytes-like object
+    (including memory-mapped files) or a file object, and yield them one at a time
+    as pairs of terms. Each two consecutive terms form an equation.
+    
+    Strings and ASCII bytes are parsed in place. Everything else is read in chunks,
+    so only the largest single term has to fit into memory. Bytes are decoded as
+    UTF-8 then, and the positions in the raised `ParseError`s are character offsets."""
+    inPlace = isinstance(source, str)
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        inPlace = nonPortableBytesRegex.search(source) is None
+        if not inPlace:
+            if isinstance(source, mmap.mmap):
+                source.seek(0)
+            else:
+                source = io.BytesIO(source)
+    
+    if inPlace:
+        parser = Parser(source)
+        while parser.skipWhitespace() < len(source):
+            yield parser.parseTerm(), parser.parseTerm()
+        return
+    
+    buffer = source.read(chunkSize)
+    eof = not buffer
+    decoder = None
+    if not isinstance(buffer, str):
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        buffer = decoder.decode(buffer, eof)
+    origin = 0
+    pos = 0
+    
+    while True:
+        parser = Parser(buffer, pos, origin)
+        try:
+            if parser.skipWhitespace() == len(buffer):
+                complete = eof
+                equation = None
+            else:
+                equation = parser.parseTerm(), parser.parseTerm()
+                # A term ending right at the end of the buffer might continue in the next chunk
+                complete = eof or parser.skipWhitespace() < len(buffer)
+        except ParseError as e:
+            # The term might only be cut off by the end of the buffer
+            if eof or e.position - origin < len(buffer):
+                raise
+            complete = False
+        
+        if complete:
+            if equation is None:
+                return
+            
+            yield equation
+            pos = parser.pos
+            continue
+        
+        # Drop what has already been parsed and read more. The amount read grows
+        # with the buffer, so long terms are not reparsed too often.
+        buffer = buffer[pos:]
+        origin += pos
+        pos = 0
+        
+        chunk = source.read(max(chunkSize, len(buffer)))
+        eof = not chunk
+        if decoder is not None:
+            chunk = decoder.decode(chunk, eof)
+        buffer += chunk
+
+def parseFile(path):
+    """Memory-map the file at `path` and yield the equations it contains."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as source:
+            yield from iterEquations(source)
+
+class RecursiveParser(Parser):
+    """The original recursive descent implementation of `Parser.parseTerm`.
+    It recurses once per nesting level and is only kept as a reference for benchmarks."""
+    
+    def parseTerm(self, sourceMayEmpty=False):
+        self.pos = whitespaceRegex.match(self.src, self.pos).end()
+
+        variableMatch = variableRegex.match(self.src, self.pos)
+        if variableMatch:
+            return self.parseVariable(False, variableMatch)
+        
+        symbolMatch = symbolRegex.match(self.src, self.pos)
+        if symbolMatch:
+            return self.parseApplication(False, symbolMatch)
+        
+        openingParentheseMatch = openingParentheseRegex.match(self.src, self.pos)
+        if openingParentheseMatch:
+            self.pos = openingParentheseMatch.end()
+            term = self.parseTerm()
+            
+            closingParentheseMatch = closingParentheseRegex.match(self.src, self.pos)
+            if not closingParentheseMatch:
+                raise ParseError("Unexpected symbol at %i, expected a closing parenthese (\")\")" % self.pos)
+        
+            self.pos = closingParentheseMatch.end()
+            return term
+        
+        if sourceMayEmpty:
+            # The fact that there simply is nothing to parse shall be accepted.
+            return None
+        else:
+            raise ParseError("Unexpected symbol at %i, expected a term" % self.pos)
+
+    def parseApplication(self, sourceMayEmpty=False, symbolMatch=None):
+        name = self.parseFunctionSymbol(sourceMayEmpty, symbolMatch)
+        if not name:
+            # The other case won't occur. In this case parseFunctionSymbol would already have thrown a ParseException
+            assert sourceMayEmpty
+            return None
+        
+        openingParentheseMatch = openingParentheseRegex.match(self.src, self.pos)
+        if not openingParentheseMatch:
+            # A function symbol with arity 0 doesn't necessarily has to be followed
+            # by an argument list.
+            self.pos = symbolMatch.end()
+            return terms.Application(name)
+        
+        self.pos = openingParentheseMatch.end()
+        closingParentheseMatch = closingParentheseRegex.match(self.src, self.pos)
+        
+        arguments = []
+        while not closingParentheseMatch:
+            term = self.parseTerm(sourceMayEmpty=False)
+            arguments.append(term)
+            
+            # Parse either an argument separator or a closing parenthese.
+            # If both cannot be found, raise a syntax error.
+            argumentSeparatorMatch = argumentSeparatorRegex.match(self.src, self.pos)
+            if not argumentSeparatorMatch:
+                closingParentheseMatch = closingParentheseRegex.match(self.src, self.pos)
+                if not closingParentheseMatch:
+                    raise ParseError("Unexpected symbol at %i, expected either an argument separator (\",\") or a closing parenthese (\")\")" % self.pos)
+                else:
+                    self.pos = closingParentheseMatch.end()
+            else:
+                self.pos = argumentSeparatorMatch.end()
+        
+        return terms.Application(name, *arguments)
@@ -1,5 +1,6 @@
 """An equation is represented by a pair of terms"""
 
+import instrumentation
 import terms
 
 def unzip(iterable):
@@ -17,12 +18,15 @@ class EqualityError(Exception):
     def __init__(self):
         Exception.__init__(self, "The terms are not equal")
 
+@instrumentation.measured('refl')
 def employReflexivity(term):
     return (term, term)
 
+@instrumentation.measured('sym')
 def employSymmetry(equation):
     return (equation[1], equation[0])
 
+@instrumentation.measured('trans')
 def employTransitivity(equation1, equation2):
     term1, left = equation1
     right, term2 = equation2
@@ -32,13 +36,29 @@ def employTransitivity(equation1, equation2):
     else:
         raise EqualityError()
 
+@instrumentation.measured('cong')
 def employCongruence(function_name, *equations):
     firsts, seconds = unzip(equations)
     
-    left = terms.Applications(function_name, *firsts)
-    rights = terms.Applications(function_name, *seconds)
+    left = terms.Application(function_name, *firsts)
+    right = terms.Application(function_name, *seconds)
     
     return left, right
 
-def employSubstitution(equation, substitution):
-    return equation[0].substitute(substitution), equation[1].substitute(substitution)
\ No newline at end of file
+def _substitute(equation, substitution, memo):
+    return equation[0].substitute(substitution, memo), equation[1].substitute(substitution, memo)
+
+@instrumentation.measured('subst')
+def employSubstitution(equation, substitution, memo=None):
+    if memo is None:
+        memo = {}
+    
+    return _substitute(equation, substitution, memo)
+
+@instrumentation.measured('subst batch')
+def employSubstitutionBatch(equations, substitution):
+    """Apply the same substitution to a number of equations.
+    Common subterms of the equations are substituted only once."""
+    memo = {}
+    # Not through employSubstitution, whose time would be recorded twice
+    return [_substitute(equation, substitution, memo) for equation in equations]
\ No newline at end of file
@@ -0,0 +1,265 @@
+"""A compact representation of terms as flat arrays of integers.
+
+A term is stored in prefix order, three integers per node: the code of its
+symbol, its arity and its size, the number of nodes of the subterm rooted there.
+Function symbols and variable names share a symbol table. The code of a function
+symbol is twice its id in the table, that of a variable one more.
+
+Because of the prefix order, every subterm is a contiguous part of the array,
+which the size of its root tells. Subterms are therefore slices of a memoryview,
+and equal terms have equal buffers. A store keeps many terms in large chunks
+which are allocated in full and never resized, so views into them stay valid
+while terms are appended. Shared subterms are copied into each term using them,
+unlike with interned terms.
+
+Bulk operations over a store, like counting symbols, work on the columns of the
+chunks at once, with NumPy if it is available."""
+
+import terms
+
+import array
+import bisect
+import collections
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# The number of integers per node
+STRIDE = 3
+ITEM_SIZE = array.array('i').itemsize
+
+class SymbolTable(object):
+    def __init__(self):
+        self.names = []
+        self.ids = {}
+
+    def id(self, name):
+        id_ = self.ids.get(name)
+        if id_ is None:
+            id_ = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return id_
+
+    def code(self, term):
+        if isinstance(term, terms.Variable):
+            return 2 * self.id(term.name) + 1
+        return 2 * self.id(term.function_name)
+
+    def name(self, code):
+        return self.names[code >> 1]
+
+def encode(term, symbols, out):
+    """Append the nodes of the term to the integer array `out`. Returns their number."""
+    begin = len(out)
+    ids = symbols.ids
+    # The positions of the nodes whose arguments are being written, and the
+    # numbers of their arguments which are still missing
+    unfinished = []
+    stack = [term]
+    while stack:
+        current = stack.pop()
+        position = len(out)
+        if isinstance(current, terms.Variable):
+            id_ = ids.get(current.name)
+            if id_ is None:
+                id_ = symbols.id(current.name)
+            out.extend((2 * id_ + 1, 0, 1))
+        else:
+            id_ = ids.get(current.function_name)
+            if id_ is None:
+                id_ = symbols.id(current.function_name)
+            arguments = current.arguments
+            if arguments:
+                # The size is filled in when all arguments are written
+                out.extend((2 * id_, len(arguments), 0))
+                stack.extend(reversed(arguments))
+                unfinished.append([position, len(arguments)])
+                continue
+            out.extend((2 * id_, 0, 1))
+
+        while unfinished:
+            node = unfinished[-1]
+            node[1] -= 1
+            if node[1]:
+                break
+            unfinished.pop()
+            out[node[0] + 2] = (len(out) - node[0]) // STRIDE
+
+    return (len(out) - begin) // STRIDE
+
+class FlatTerm(object):
+    """A term as a view on its nodes. Slicing subterms doesn't copy anything."""
+
+    __slots__ = ('nodes', 'symbols')
+
+    def __init__(self, nodes, symbols):
+        self.nodes = nodes
+        self.symbols = symbols
+
+    @classmethod
+    def fromTerm(cls, term, symbols=None):
+        symbols = symbols or SymbolTable()
+        nodes = array.array('i')
+        encode(term, symbols, nodes)
+        return cls(memoryview(nodes), symbols)
+
+    def __len__(self):
+        """The number of nodes."""
+        return len(self.nodes) // STRIDE
+
+    def __eq__(self, other):
+        if not isinstance(other, FlatTerm) or self.symbols is not other.symbols:
+            return NotImplemented
+        # Comparing byte views compares the buffers with memcmp
+        return self.nodes.cast('B') == other.nodes.cast('B')
+
+    def __hash__(self):
+        return hash(self.nodes.tobytes())
+
+    def code(self, position=0):
+        return self.nodes[STRIDE * position]
+
+    def arity(self, position=0):
+        return self.nodes[STRIDE * position + 1]
+
+    def size(self, position=0):
+        return self.nodes[STRIDE * position + 2]
+
+    def subterm(self, position):
+        """Return the subterm whose root is the node at `position` in prefix order."""
+        start = STRIDE * position
+        return FlatTerm(self.nodes[start:start + STRIDE * self.nodes[start + 2]], self.symbols)
+
+    def argumentPositions(self, position=0):
+        """Return the positions of the arguments of the node at `position`."""
+        positions = []
+        argument = position + 1
+        for _ in range(self.arity(position)):
+            positions.append(argument)
+            argument += self.size(argument)
+        return positions
+
+    def arguments(self):
+        return [self.subterm(position) for position in self.argumentPositions()]
+
+    def toTerm(self):
+        # Building the nodes from the last to the first, the arguments of a node
+        # are on top of the stack in the right order when it is reached.
+        nodes = self.nodes
+        names = self.symbols.names
+        stack = []
+        for start in range(len(nodes) - STRIDE, -1, -STRIDE):
+            code, arity = nodes[start], nodes[start + 1]
+            if code & 1:
+                stack.append(terms.Variable(names[code >> 1]))
+            elif arity:
+                arguments = stack[-arity:]
+                del stack[-arity:]
+                arguments.reverse()
+                stack.append(terms.Application(names[code >> 1], *arguments))
+            else:
+                stack.append(terms.Application(names[code >> 1]))
+
+        return stack[0]
+
+    def __str__(self):
+        return str(self.toTerm())
+
+class FlatTermStore(object):
+    """Many terms in chunks of nodes. A term never spans chunks; terms bigger than
+    a chunk get a chunk of their own."""
+
+    def __init__(self, symbols=None, chunkSize=1 << 16):
+        self.symbols = symbols or SymbolTable()
+        # The number of nodes per chunk
+        self.chunkSize = chunkSize
+        self.chunks = []
+        # The number of nodes used in each chunk
+        self.used = []
+        # For each chunk, the index of its first term and the positions of its terms
+        self.firstTerms = []
+        self.starts = []
+        # The chunk of every term
+        self.termChunks = array.array('i')
+
+    def __len__(self):
+        return len(self.termChunks)
+
+    def append(self, term):
+        """Add a term and return its index."""
+        nodes = array.array('i')
+        size = encode(term, self.symbols, nodes)
+
+        if not self.chunks or self.used[-1] + size > len(self.chunks[-1]) // STRIDE:
+            # Allocate the whole chunk at once, so it is never resized
+            chunk = array.array('i', bytes(ITEM_SIZE * STRIDE * max(size, self.chunkSize)))
+            self.chunks.append(chunk)
+            self.used.append(0)
+            self.firstTerms.append(len(self))
+            self.starts.append(array.array('i'))
+
+        start = self.used[-1]
+        self.chunks[-1][STRIDE * start:STRIDE * (start + size)] = nodes
+        self.used[-1] = start + size
+        self.starts[-1].append(start)
+        self.termChunks.append(len(self.chunks) - 1)
+        return len(self) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        chunk = self.termChunks[index]
+        start = self.starts[chunk][index - self.firstTerms[chunk]]
+        size = self.chunks[chunk][STRIDE * start + 2]
+        view = memoryview(self.chunks[chunk])[STRIDE * start:STRIDE * (start + size)]
+        return FlatTerm(view, self.symbols)
+
+    def nbytes(self):
+        """The memory used by the nodes, including unused parts of the chunks."""
+        return sum(chunk.itemsize * len(chunk) for chunk in self.chunks) + \
+                sum(starts.itemsize * len(starts) for starts in self.starts) + \
+                self.termChunks.itemsize * len(self.termChunks)
+
+    def codes(self, chunk):
+        """The codes of the used nodes of a chunk."""
+        used = self.used[chunk]
+        if numpy is not None:
+            return numpy.frombuffer(self.chunks[chunk], dtype=numpy.intc)[0:STRIDE * used:STRIDE]
+        return self.chunks[chunk][0:STRIDE * used:STRIDE]
+
+    def countSymbols(self):
+        """Return how often each function symbol and variable occurs in all terms together."""
+        counts = collections.Counter()
+        for chunk in range(len(self.chunks)):
+            codes = self.codes(chunk)
+            if numpy is not None:
+                values, occurrences = numpy.unique(codes, return_counts=True)
+                counts.update(dict(zip(values.tolist(), occurrences.tolist())))
+            else:
+                counts.update(codes)
+
+        # Variables are named like in terms, with a leading ":"
+        return {(':' if code & 1 else '') + self.symbols.name(code): count
+                for code, count in counts.items()}
+
+    def findSymbol(self, name, variable=False):
+        """Yield the indizes of the terms in which the function symbol or variable
+        occurs, together with the positions of its occurrences in prefix order."""
+        id_ = self.symbols.ids.get(name)
+        if id_ is None:
+            return
+        code = 2 * id_ + (1 if variable else 0)
+
+        for chunk in range(len(self.chunks)):
+            codes = self.codes(chunk)
+            if numpy is not None:
+                nodes = numpy.flatnonzero(codes == code).tolist()
+            else:
+                nodes = [node for node, value in enumerate(codes) if value == code]
+
+            starts = self.starts[chunk]
+            for node in nodes:
+                term = bisect.bisect_right(starts, node) - 1
+                yield self.firstTerms[chunk] + term, node - starts[term]
@@ -0,0 +1,127 @@
+"""Counters showing where the time of a session goes.
+
+Instrumentation is off unless statistics are activated. The instrumented
+modules keep a module-level `statistics`, which is None while it is off, so the
+only cost then is checking it. A calculator with statistics of its own activates
+them while it runs a command, so sessions sharing a process record separately.
+While it is on, these are recorded:
+
+ * the calls of each command and of each inference rule, and their total time
+ * the number of bytes parsed as terms, counted as UTF-8 for text, and the time it took
+ * the number of term nodes newly allocated and of those reused from the intern table
+ * the peak numbers of equations and of interned terms"""
+
+import equationparser
+import terms
+
+import functools
+import json
+import time
+
+class Statistics(object):
+    def __init__(self):
+        # Map names to pairs of call counts and total seconds
+        self.commands = {}
+        self.rules = {}
+
+        self.parsedBytes = 0
+        self.parserSeconds = 0.0
+
+        self.termsAllocated = 0
+        self.termsReused = 0
+
+        self.peakEquations = 0
+        self.peakTerms = 0
+
+    def recordCommand(self, name, seconds):
+        timing = self.commands.setdefault(name, [0, 0.0])
+        timing[0] += 1
+        timing[1] += seconds
+
+    def recordRule(self, name, seconds):
+        timing = self.rules.setdefault(name, [0, 0.0])
+        timing[0] += 1
+        timing[1] += seconds
+
+    def recordParsing(self, bytes_, seconds):
+        self.parsedBytes += bytes_
+        self.parserSeconds += seconds
+
+    def recordSizes(self, equations):
+        self.peakEquations = max(self.peakEquations, equations)
+        self.peakTerms = max(self.peakTerms, len(terms._internTable))
+
+    def asDict(self):
+        def timings(table):
+            return {name: {'calls': count, 'seconds': seconds} for name, (count, seconds) in sorted(table.items())}
+
+        return {
+            'commands': timings(self.commands),
+            'rules': timings(self.rules),
+            'parser': {
+                'bytes': self.parsedBytes,
+                'seconds': self.parserSeconds,
+                'bytesPerSecond': self.parsedBytes / self.parserSeconds if self.parserSeconds else 0.0,
+            },
+            'terms': {
+                'allocated': self.termsAllocated,
+                'reused': self.termsReused,
+            },
+            'peaks': {
+                'equations': self.peakEquations,
+                'terms': self.peakTerms,
+            },
+        }
+
+    def report(self, file):
+        for title, table in (("command", self.commands), ("rule", self.rules)):
+            print("%-12s %10s %10s %12s" % (title, "calls", "seconds", "ms/call"), file=file)
+            for name, (count, seconds) in sorted(table.items(), key=lambda item: -item[1][1]):
+                print("%-12s %10d %10.3f %12.3f" % (name, count, seconds, 1000 * seconds / count), file=file)
+
+        print("parser: %d bytes in %.3f s (%.0f bytes/s)" % (self.parsedBytes, self.parserSeconds,
+                self.parsedBytes / self.parserSeconds if self.parserSeconds else 0.0), file=file)
+        total = self.termsAllocated + self.termsReused
+        print("terms: %d nodes allocated, %d reused (%.1f%% reused)" % (self.termsAllocated, self.termsReused,
+                100.0 * self.termsReused / total if total else 0.0), file=file)
+        print("peaks: %d equations, %d interned terms" % (self.peakEquations, self.peakTerms), file=file)
+
+    def dump(self, file):
+        json.dump(self.asDict(), file, indent=2)
+        file.write("\n")
+
+# The statistics being recorded, or None if instrumentation is off
+statistics = None
+
+def activate(statistics_):
+    """Record into `statistics_`, or stop recording if it is None. Returns the
+    statistics recorded into before."""
+    global statistics
+    previous = statistics
+    statistics = terms.statistics = equationparser.statistics = statistics_
+    return previous
+
+def enable():
+    """Start recording into fresh statistics and return them."""
+    activate(Statistics())
+    return statistics
+
+def disable():
+    activate(None)
+
+def measured(name):
+    """Decorate a function implementing an inference rule to record its calls under `name`."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if statistics is None:
+                return function(*args, **kwargs)
+
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                statistics.recordRule(name, time.perf_counter() - start)
+
+        return wrapper
+    return decorate
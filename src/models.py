@@ -0,0 +1,126 @@
+"""Finite models to refute equations quickly.
+
+A model interprets the function symbols as operations on the domain 0, ..., n-1,
+given by their tables: an n x ... x n array with one axis per argument.
+An equation is evaluated for all assignments of its variables at once. Each
+variable becomes an index array along its own axis, and applying a function
+symbol is a single fancy indexing operation on its table, broadcasting the
+arrays of the arguments against each other. The result has one axis per variable,
+so comparing both sides gives the truth value for every assignment.
+
+Models are stored as JSON objects like this, where constants are plain numbers:
+
+    {"size": 2, "functions": {"*": [[0, 1], [1, 0]], "-1": [0, 1], "e": 0}}
+
+NumPy is required to use models."""
+
+import terms
+
+import json
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+class ModelError(Exception):
+    pass
+
+class FiniteModel(object):
+    # Equations with more assignments than this are not checked
+    maxAssignments = 1 << 26
+
+    def __init__(self, size, functions):
+        if numpy is None:
+            raise ModelError("Finite models require NumPy")
+        if size < 1:
+            raise ModelError("The domain of a model can't be empty")
+
+        self.size = size
+        self.tables = {}
+        arities = {}
+        for name, table in functions.items():
+            table = numpy.asarray(table, dtype=numpy.intp)
+            if table.shape != (size,) * table.ndim:
+                raise ModelError("The table of %s doesn't have %d rows along each axis" % (name, size))
+            if table.size and (table.min() < 0 or table.max() >= size):
+                raise ModelError("The table of %s has values outside of the domain" % name)
+
+            self.tables[name] = table
+            arities[name] = table.ndim
+
+        self.signature = terms.Signature(arities)
+
+    def evaluate(self, term, assignment):
+        """Evaluate a term for the values of the variables in `assignment`,
+        which maps variable names to arrays broadcastable against each other."""
+        values = {}
+        stack = [term]
+        while stack:
+            current = stack[-1]
+            if current in values:
+                stack.pop()
+            elif isinstance(current, terms.Variable):
+                values[current] = assignment[current.name]
+                stack.pop()
+            else:
+                pending = [argument for argument in current.arguments if argument not in values]
+                if pending:
+                    stack.extend(pending)
+                    continue
+
+                stack.pop()
+                table = self.tables[current.function_name]
+                values[current] = table[tuple(values[argument] for argument in current.arguments)]
+
+        return values[term]
+
+    def counterexample(self, equation):
+        """Return an assignment of the variables, together with the values of the sides,
+        for which the equation doesn't hold, or None if it holds in the model."""
+        left, right = equation
+        for side in equation:
+            if not terms.matchesSignature(side, self.signature):
+                application = self.signature.violation(side)
+                arity = self.signature.arity(application.function_name)
+                if arity is None:
+                    raise ModelError("The model doesn't interpret the function symbol %s" % application.function_name)
+                raise ModelError("The model interprets %s with %d arguments, not %d" % (
+                        application.function_name, arity, len(application.arguments)))
+
+        names = sorted(left.variables() | right.variables())
+        if self.size ** len(names) > self.maxAssignments:
+            raise ModelError("There are too many assignments of %d variables to check" % len(names))
+
+        # The values of the i-th variable vary along the i-th axis
+        assignment = {}
+        for axis, name in enumerate(names):
+            shape = [1] * len(names)
+            shape[axis] = self.size
+            assignment[name] = numpy.arange(self.size).reshape(shape)
+
+        leftValues = self.evaluate(left, assignment)
+        rightValues = self.evaluate(right, assignment)
+        failures = numpy.argwhere(numpy.broadcast_to(leftValues != rightValues, (self.size,) * len(names)))
+        if not len(failures):
+            return None
+
+        index = tuple(failures[0])
+        values = {name: int(value) for name, value in zip(names, index)}
+        # A side without some of the variables has length 1 along their axes
+        leftValue = numpy.broadcast_to(leftValues, (self.size,) * len(names))[index]
+        rightValue = numpy.broadcast_to(rightValues, (self.size,) * len(names))[index]
+        return values, int(leftValue), int(rightValue)
+
+def load(path):
+    """Read a model from a JSON file."""
+    with open(path) as f:
+        try:
+            data = json.load(f)
+        except ValueError as e:
+            raise ModelError("%s is not a JSON file: %s" % (path, e))
+
+    try:
+        return FiniteModel(int(data['size']), data['functions'])
+    except (KeyError, TypeError, ValueError) as e:
+        raise ModelError("%s doesn't describe a model: %s" % (path, e))
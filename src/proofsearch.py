@@ -0,0 +1,125 @@
+"""Search for a chain of rewrite steps connecting two terms.
+
+A rewrite step replaces an instance of one side of an equation by the
+corresponding instance of the other side, anywhere inside a term. The search
+runs breadth first from both terms at once and always expands the smaller
+frontier, so it only has to go half as deep on each side as a search from one
+term. Every term reached is recorded once, together with the step it was reached
+by. As terms are interned, these records are keyed by identity, and the total
+number of them is bounded."""
+
+import terms
+import unification
+
+import time
+
+class Step(object):
+    """A rewrite step from `source` to `target` with the equation at `index`,
+    from its left to its right side unless `reverse` is true."""
+
+    __slots__ = ('source', 'target', 'index', 'reverse', 'position', 'substitution')
+
+    def __init__(self, source, target, index, reverse, position, substitution):
+        self.source = source
+        self.target = target
+        self.index = index
+        self.reverse = reverse
+        self.position = position
+        self.substitution = substitution
+
+    def inverse(self):
+        return Step(self.target, self.source, self.index, not self.reverse,
+                self.position, self.substitution)
+
+class ProofSearch(object):
+    def __init__(self, equations, index, maxTerms=100000, timeLimit=None):
+        """`equations` is the sequence of equations and `index` a discrimination
+        tree mapping both of their sides to their indizes, counted from 1. The
+        search gives up after visiting `maxTerms` terms or after `timeLimit` seconds."""
+        self.equations = equations
+        self.index = index
+        self.maxTerms = maxTerms
+        self.timeLimit = timeLimit
+        self.deadline = None
+        self.visited = 0
+
+    def rewrites(self, term):
+        """Yield all steps from `term`. Sides which are variables are never
+        rewritten, as they would match every subterm."""
+        for position, subterm in terms.positions(term):
+            for stored, index in self.index.candidates(subterm, True, False):
+                if isinstance(stored, terms.Variable):
+                    continue
+                substitution = unification.match(stored, subterm)
+                if substitution is None:
+                    continue
+
+                left, right = self.equations[index - 1]
+                for side, other, reverse in ((left, right, False), (right, left, True)):
+                    # The other side mustn't have variables which the match doesn't bind
+                    if side is stored and other.variables() <= side.variables():
+                        target = terms.replace(term, position, other.substitute(substitution))
+                        yield Step(term, target, index, reverse, position, substitution)
+
+    def search(self, start, goal):
+        """Return the steps of a shortest chain from `start` to `goal`, or None
+        if none was found within the limits."""
+        if self.timeLimit is not None:
+            self.deadline = time.perf_counter() + self.timeLimit
+
+        # Map the terms reached from each side to the steps they were reached by
+        forward, backward = {start: None}, {goal: None}
+        forwardFrontier, backwardFrontier = [start], [goal]
+        self.visited = 2
+
+        meeting = start if start is goal else None
+        while meeting is None:
+            # Either a limit was exceeded, or neither side can reach further terms
+            if forwardFrontier is None or backwardFrontier is None:
+                return None
+            if not forwardFrontier and not backwardFrontier:
+                return None
+
+            # A side whose frontier is empty has reached all it can, but the
+            # other side might still reach one of its terms
+            if forwardFrontier and (not backwardFrontier or len(forwardFrontier) <= len(backwardFrontier)):
+                forwardFrontier, meeting = self.expand(forwardFrontier, forward, backward)
+            else:
+                backwardFrontier, meeting = self.expand(backwardFrontier, backward, forward)
+
+        steps = []
+        term = meeting
+        while forward[term] is not None:
+            steps.append(forward[term])
+            term = forward[term].source
+        steps.reverse()
+
+        term = meeting
+        while backward[term] is not None:
+            steps.append(backward[term].inverse())
+            term = backward[term].source
+
+        return steps
+
+    def expand(self, frontier, reached, other):
+        """Advance a frontier by one level. Returns the next frontier and a term
+        reached from both sides, if there is one. The next frontier is None
+        if a limit is exceeded."""
+        nextFrontier = []
+        for term in frontier:
+            for step in self.rewrites(term):
+                if step.target in reached:
+                    continue
+
+                reached[step.target] = step
+                if step.target in other:
+                    return nextFrontier, step.target
+
+                self.visited += 1
+                if self.visited > self.maxTerms:
+                    return None, None
+                if self.deadline is not None and time.perf_counter() > self.deadline:
+                    return None, None
+                nextFrontier.append(step.target)
+
+        return nextFrontier, None
@@ -0,0 +1,161 @@
+"""Rewriting of terms to normal form with oriented equations.
+
+A rewrite system replaces instances of the left sides of its rules by the
+corresponding instances of the right sides, until no rule applies anymore.
+Arguments are normalized before the term itself (innermost strategy). The
+left sides are kept in a discrimination tree to find applicable rules, and
+normal forms are cached across calls in a bounded LRU table."""
+
+import termindex
+import terms
+
+import collections
+import time
+
+class RewriteError(Exception):
+    pass
+
+class RewriteSystem(object):
+    def __init__(self, rules=(), cacheSize=1 << 16, maxSteps=1 << 20):
+        self.rules = []
+        self.index = termindex.DiscriminationTree()
+
+        # Maps terms to their normal forms, least recently used first
+        self.normalForms = collections.OrderedDict()
+        self.cacheSize = cacheSize
+
+        # The maximal number of rewrite steps per normalization. Exceeding it
+        # most likely means that the rules don't terminate.
+        self.maxSteps = maxSteps
+
+        for left, right in rules:
+            self.addRule(left, right)
+
+    def addRule(self, left, right):
+        if isinstance(left, terms.Variable):
+            raise RewriteError("The left side of a rewrite rule can't be a variable")
+        if not right.variables() <= left.variables():
+            raise RewriteError("The right side of a rewrite rule can't have variables which don't occur on the left side")
+
+        self.index.insert(left, len(self.rules))
+        self.rules.append((left, right))
+        # The known normal forms might be reducible with the new rule
+        self.normalForms.clear()
+        return len(self.rules) - 1
+
+    def removeRule(self, rule):
+        """Stop using a rule. The ids of the other rules stay the same."""
+        self.rules[rule] = None
+        self.normalForms.clear()
+
+    def rewriteRoot(self, term):
+        """Apply the first applicable rule at the root of the term.
+        Returns None if there is none."""
+        for rule, substitution in self.index.matches(term):
+            if self.rules[rule] is not None:
+                return self.rules[rule][1].substitute(substitution)
+
+        return None
+
+    def lookup(self, term):
+        normalForm = self.normalForms.get(term)
+        if normalForm is not None:
+            self.normalForms.move_to_end(term)
+        return normalForm
+
+    def remember(self, term, normalForm):
+        self.normalForms[term] = normalForm
+        if len(self.normalForms) > self.cacheSize:
+            self.normalForms.popitem(last=False)
+
+    def normalize(self, term, timeLimit=None):
+        """Return the normal form of the term. Raises a RewriteError if there
+        are more than `maxSteps` rewrite steps or it takes longer than
+        `timeLimit` seconds."""
+        normalForm = self.lookup(term)
+        if normalForm is not None:
+            return normalForm
+
+        # Normal forms found during this call. They are only added to the cache
+        # at the end, so they aren't evicted while they are still needed.
+        found = {}
+        # Maps terms with normalized arguments to the result of rewriting them at the root
+        reducts = {}
+        steps = 0
+        deadline = None if timeLimit is None else time.perf_counter() + timeLimit
+
+        stack = [term]
+        while stack:
+            current = stack[-1]
+            if current in found:
+                stack.pop()
+                continue
+
+            normalForm = self.lookup(current)
+            if normalForm is not None:
+                found[current] = normalForm
+                stack.pop()
+                continue
+
+            if isinstance(current, terms.Variable):
+                found[current] = current
+                stack.pop()
+                continue
+
+            pending = [argument for argument in current.arguments if argument not in found]
+            if pending:
+                stack.extend(pending)
+                continue
+
+            reduced = terms.Application(current.function_name,
+                    *[found[argument] for argument in current.arguments])
+            reduct = reducts.get(reduced)
+            if reduct is None:
+                reduct = self.rewriteRoot(reduced)
+                if reduct is None:
+                    found[current] = found[reduced] = reduced
+                    stack.pop()
+                    continue
+
+                reducts[reduced] = reduct
+
+            if reduct in found:
+                found[current] = found[reduced] = found[reduct]
+                stack.pop()
+            else:
+                steps += 1
+                if steps > self.maxSteps:
+                    raise RewriteError("No normal form found after %d rewrite steps" % self.maxSteps)
+                # The clock is only read every 1024 steps
+                if deadline is not None and not steps & 1023 and time.perf_counter() > deadline:
+                    raise RewriteError("No normal form found within %g seconds" % timeLimit)
+                stack.append(reduct)
+
+        # A call finding many normal forms would evict most of the cache with
+        # the intermediate reducts
+        if len(found) <= self.cacheSize // 16:
+            for subterm, normalForm in found.items():
+                self.remember(subterm, normalForm)
+        else:
+            self.rememberSubterms(term, found)
+
+        return found[term]
+
+    def rememberSubterms(self, term, found):
+        """Cache the normal forms of the term and of its subterms, but not those of
+        the intermediate reducts, which are rarely met again. If there
+        are still too many, those nearest to the root are kept. Subterms below
+        ones whose normal form was already cached weren't visited and are skipped."""
+        subterms = [term]
+        seen = {term}
+        for subterm in subterms:
+            if len(subterms) >= self.cacheSize:
+                break
+            if isinstance(subterm, terms.Application):
+                for argument in subterm.arguments:
+                    if argument in found and argument not in seen and len(subterms) < self.cacheSize:
+                        seen.add(argument)
+                        subterms.append(argument)
+
+        for subterm in reversed(subterms):
+            self.remember(subterm, found[subterm])
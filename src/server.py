@@ -0,0 +1,130 @@
+"""Serve calculator sessions over TCP or Unix sockets.
+
+Every connection is a session with its own calculator, and so its own equations.
+The commands are read line by line and dispatched to the usual `do_*` handlers.
+After the output of each command, the server sends the prompt "> " at the start
+of a line, so clients can tell where a response ends.
+
+All sessions live in one process and share the table of interned terms, so
+terms used by several sessions, like common axioms, exist only once. Commands
+run one at a time on a single worker thread, as the intern table isn't safe to
+use from several threads at once, while the event loop keeps serving the
+connections. Responses are only sent as fast as the clients read them, and a
+session doesn't read its next command before its response is sent.
+
+Clients mustn't reach the server's files, so the commands reading or writing
+files are turned off in the sessions. As every command holds up the others
+while it runs, complete, prove and normalize give up after a time limit, and
+printed terms are cut off after a number of characters, as terms whose shared
+subterms are small can still be exponentially long when written out.
+Statistics are recorded per session."""
+
+import calculator
+
+import argparse
+import asyncio
+import concurrent.futures
+import io
+
+PROMPT = b"> "
+
+class Server(object):
+    def __init__(self, lineLimit=1 << 24, timeLimit=10.0, termLengthLimit=1 << 16):
+        # The longest command accepted, in bytes
+        self.lineLimit = lineLimit
+        # The longest time in seconds which complete, prove and normalize may take
+        self.timeLimit = timeLimit
+        # The most characters printed of a term
+        self.termLengthLimit = termLengthLimit
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.sessions = 0
+
+    async def handleSession(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        output = io.StringIO()
+        session = calculator.Calculator(io.StringIO(), output)
+        session.fileAccess = False
+        session.timeLimit = self.timeLimit
+        session.maxTermLength = self.termLengthLimit
+        self.sessions += 1
+        try:
+            writer.write(b"Welcome to the equational calculator.\n" + PROMPT)
+            await writer.drain()
+            while True:
+                try:
+                    line = await reader.readuntil(b"\n")
+                except asyncio.IncompleteReadError as e:
+                    # The connection was closed, maybe after a last line without a newline
+                    line = e.partial
+                except asyncio.LimitOverrunError:
+                    # The rest of the line mustn't be taken for the next command
+                    await self.skipLine(reader)
+                    writer.write(b"-- The command is too long\n" + PROMPT)
+                    await writer.drain()
+                    continue
+
+                if not line:
+                    break
+
+                line = line.decode('utf-8', 'replace').strip()
+                stop = False
+                if line and not line.startswith('#'):
+                    stop = await loop.run_in_executor(self.executor, session.onecmd, line)
+
+                writer.write(output.getvalue().encode('utf-8'))
+                output.seek(0)
+                output.truncate()
+                if stop:
+                    break
+
+                writer.write(PROMPT)
+                await writer.drain()
+
+        except ConnectionError:
+            pass
+        finally:
+            self.sessions -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def skipLine(self, reader):
+        """Discard the input up to and including the next newline, or up to the end."""
+        while True:
+            try:
+                await reader.readuntil(b"\n")
+                return
+            except asyncio.IncompleteReadError:
+                return
+            except asyncio.LimitOverrunError as e:
+                # The data stays in the buffer, so it is dropped before reading on
+                await reader.readexactly(e.consumed)
+
+    async def serve(self, host=None, port=None, path=None):
+        """Accept connections on a Unix socket at `path`, or on a TCP port, forever."""
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handleSession, path, limit=self.lineLimit)
+        else:
+            server = await asyncio.start_server(self.handleSession, host, port, limit=self.lineLimit)
+
+        async with server:
+            await server.serve_forever()
+
+if __name__ == '__main__':
+    argumentParser = argparse.ArgumentParser(description="Serve calculator sessions over a socket")
+    address = argumentParser.add_mutually_exclusive_group(required=True)
+    address.add_argument('--port', type=int, help="listen on this TCP port")
+    address.add_argument('--unix', metavar='PATH', help="listen on a Unix socket at this path")
+    argumentParser.add_argument('--host', default='localhost', help="the address to listen on with --port (default: localhost)")
+    argumentParser.add_argument('--time-limit', type=float, default=10.0,
+            help="the longest time in seconds which complete, prove and normalize may take (default: 10)")
+    argumentParser.add_argument('--term-length-limit', type=int, default=1 << 16,
+            help="the most characters printed of a term (default: 65536)")
+    arguments = argumentParser.parse_args()
+
+    try:
+        asyncio.run(Server(timeLimit=arguments.time_limit, termLengthLimit=arguments.term_length_limit).serve(arguments.host, arguments.port, arguments.unix))
+    except KeyboardInterrupt:
+        pass
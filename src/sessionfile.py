@@ -0,0 +1,249 @@
+"""A compact binary format to save the equations of a session and their derivations.
+
+The file consists of a header followed by these sections, each padded to a
+multiple of 8 bytes:
+
+ * the end offsets of the names in the symbol table, and the UTF-8 encoded names
+ * the offsets of the term records, and the term records themselves
+ * the ids of the left and right sides of each equation
+ * the columns of the derivation store
+
+Function symbols and variable names share the symbol table. Every distinct
+subterm is stored once, as a record of its symbol, its arity and the ids of
+its arguments. Arguments always precede the terms using them.
+
+All numbers are stored in the byte order of the machine writing the file.
+Loading maps the file into memory and only builds terms when they are accessed,
+so even huge sessions open quickly."""
+
+import derivations
+import terms
+
+import array
+import collections.abc
+import itertools
+import mmap
+import os
+import struct
+
+MAGIC = b'EQS1'
+BYTE_ORDER_MARK = 0x01020304
+
+# magic, byte order mark, number of symbols, length of the symbol names, number
+# of terms, length of the term records, number of equations, number of premises
+headerStruct = struct.Struct('=4sIIIIIIQ')
+
+class SessionFileError(Exception):
+    pass
+
+def _padding(length):
+    return b'\0' * (-length % 8)
+
+def save(path, equations, derivationStore):
+    symbols = {}
+    symbolNames = []
+    termIds = {}
+    offsets = array.array('I')
+    records = array.array('I')
+
+    def symbolId(name):
+        id_ = symbols.get(name)
+        if id_ is None:
+            id_ = symbols[name] = len(symbolNames)
+            symbolNames.append(name)
+        return id_
+
+    def termId(root):
+        # Number the subterms in postorder, so arguments precede the terms using them
+        stack = [root]
+        while stack:
+            term = stack[-1]
+            if term in termIds:
+                stack.pop()
+                continue
+
+            if isinstance(term, terms.Variable):
+                record = [symbolId(term.name) * 2 + 1, 0]
+            else:
+                pending = [argument for argument in term.arguments if argument not in termIds]
+                if pending:
+                    stack.extend(pending)
+                    continue
+                record = [symbolId(term.function_name) * 2, len(term.arguments)]
+                record.extend(termIds[argument] for argument in term.arguments)
+
+            stack.pop()
+            termIds[term] = len(offsets)
+            offsets.append(len(records))
+            records.extend(record)
+
+        return termIds[root]
+
+    sides = array.array('I')
+    for left, right in equations:
+        sides.append(termId(left))
+        sides.append(termId(right))
+
+    encodedNames = [name.encode('utf-8') for name in symbolNames]
+    symbolEnds = array.array('I')
+    length = 0
+    for name in encodedNames:
+        length += len(name)
+        symbolEnds.append(length)
+
+    sections = [
+        symbolEnds.tobytes(),
+        b''.join(encodedNames),
+        offsets.tobytes(),
+        records.tobytes(),
+        sides.tobytes(),
+        derivationStore.rules.tobytes(),
+        derivationStore.premiseEnds.tobytes(),
+        derivationStore.premises.tobytes(),
+    ]
+
+    # The file is written under a temporary name and then renamed, so that a
+    # session loaded from it, which still maps the old contents, stays intact
+    descriptor, temporaryPath = _createTemporary(path)
+    try:
+        with os.fdopen(descriptor, 'wb') as f:
+            f.write(headerStruct.pack(MAGIC, BYTE_ORDER_MARK, len(symbolNames), length,
+                    len(offsets), len(records), len(sides) // 2, len(derivationStore.premises)))
+            f.write(_padding(headerStruct.size))
+            for section in sections:
+                f.write(section)
+                f.write(_padding(len(section)))
+        os.replace(temporaryPath, path)
+    except BaseException:
+        os.unlink(temporaryPath)
+        raise
+
+def _createTemporary(path):
+    """Create a new file next to `path` and return its descriptor and name.
+    Like files created by `open`, it gets the usual permissions under the umask."""
+    flags = os.O_CREAT | os.O_EXCL | os.O_WRONLY | getattr(os, 'O_BINARY', 0)
+    for attempt in itertools.count():
+        temporaryPath = "%s.%d.%d.tmp" % (path, os.getpid(), attempt)
+        try:
+            return os.open(temporaryPath, flags, 0o666), temporaryPath
+        except FileExistsError:
+            continue
+
+class LazyTermTable(object):
+    """Builds the terms stored in a session file when they are first accessed."""
+
+    def __init__(self, symbolEnds, symbolNames, offsets, records):
+        self.symbolEnds = symbolEnds
+        self.symbolNames = symbolNames
+        self.offsets = offsets
+        self.records = records
+        # Keeps the built terms alive, as the intern table only holds weak references
+        self.terms = {}
+
+    def symbol(self, id_):
+        start = self.symbolEnds[id_ - 1] if id_ else 0
+        return bytes(self.symbolNames[start:self.symbolEnds[id_]]).decode('utf-8')
+
+    def __getitem__(self, id_):
+        term = self.terms.get(id_)
+        if term is not None:
+            return term
+
+        stack = [id_]
+        while stack:
+            id_ = stack[-1]
+            if id_ in self.terms:
+                stack.pop()
+                continue
+
+            offset = self.offsets[id_]
+            symbol, arity = self.records[offset], self.records[offset + 1]
+            arguments = self.records[offset + 2:offset + 2 + arity]
+            # Arguments precede the terms using them, so this also rules out cycles
+            if any(argument >= id_ for argument in arguments):
+                raise SessionFileError("Term %d of the session file refers to a term which isn't stored before it" % id_)
+            pending = [argument for argument in arguments if argument not in self.terms]
+            if pending:
+                stack.extend(pending)
+                continue
+
+            stack.pop()
+            if symbol & 1:
+                self.terms[id_] = terms.Variable(self.symbol(symbol >> 1))
+            else:
+                self.terms[id_] = terms.Application(self.symbol(symbol >> 1),
+                        *[self.terms[argument] for argument in arguments])
+
+        return self.terms[id_]
+
+class LazyEquationList(collections.abc.Sequence):
+    """The equations of a session file, followed by those appended afterwards."""
+
+    def __init__(self, table, sides):
+        self.table = table
+        self.sides = sides
+        self.loaded = len(sides) // 2
+        self.appended = []
+
+    def __len__(self):
+        return self.loaded + len(self.appended)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if index >= self.loaded:
+            return self.appended[index - self.loaded]
+        if index < 0:
+            raise IndexError(index)
+
+        return self.table[self.sides[2 * index]], self.table[self.sides[2 * index + 1]]
+
+    def append(self, equation):
+        self.appended.append(equation)
+
+def load(path):
+    """Map a session file into memory and return its equations as a lazily
+    evaluated sequence, together with their derivations."""
+    with open(path, 'rb') as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # The file is empty
+            raise SessionFileError("%s is not a session file" % path)
+
+    try:
+        magic, byteOrderMark, symbolCount, symbolLength, termCount, recordLength, \
+                equationCount, premiseCount = headerStruct.unpack_from(data)
+    except struct.error:
+        raise SessionFileError("%s is not a session file" % path)
+
+    if magic != MAGIC:
+        raise SessionFileError("%s is not a session file" % path)
+    if byteOrderMark != BYTE_ORDER_MARK:
+        raise SessionFileError("%s was written on a machine with a different byte order" % path)
+
+    view = memoryview(data)
+    position = headerStruct.size + len(_padding(headerStruct.size))
+
+    def section(length, format):
+        nonlocal position
+        size = length * struct.calcsize(format)
+        if position + size > len(data):
+            raise SessionFileError("%s is truncated" % path)
+        result = view[position:position + size].cast(format)
+        position += size + len(_padding(size))
+        return result
+
+    symbolEnds = section(symbolCount, 'I')
+    symbolNames = section(symbolLength, 'B')
+    offsets = section(termCount, 'I')
+    records = section(recordLength, 'I')
+    sides = section(2 * equationCount, 'I')
+
+    store = derivations.DerivationStore()
+    store.rules.frombytes(section(equationCount, 'B'))
+    store.premiseEnds.frombytes(section(equationCount, 'q').cast('B'))
+    store.premises.frombytes(section(premiseCount, 'q').cast('B'))
+
+    table = LazyTermTable(symbolEnds, symbolNames, offsets, records)
+    return LazyEquationList(table, sides), store
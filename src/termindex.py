@@ -0,0 +1,160 @@
+"""A discrimination tree to find stored terms by matching.
+
+Terms are stored along the path of their function symbols in preorder, with all
+variables collapsed into a single wildcard. A query only has to follow the paths
+compatible with its own symbols, so its cost depends on the query and the number
+of results, but hardly on the number of stored terms. As the wildcard forgets
+which variables are equal, the candidates are checked by matching afterwards.
+
+Terms share their subterms, so a term may be exponentially bigger as a tree
+than the number of its distinct nodes. Paths are therefore cut off after a
+limited number of keys, and the subterms not visited by then are stored as
+`TRUNCATED`, which stands for any subterm. Queries always follow it."""
+
+import terms
+import unification
+
+# Stands for any variable in the flattened form of a term
+WILDCARD = None
+
+# Stands for any subterm past the end of a cut off path
+TRUNCATED = ()
+
+def flatten(term, maxKeys=None):
+    """Return the keys of the subterms of `term` in preorder. Applications are
+    represented by their function symbol and arity, variables by the `WILDCARD`.
+    After `maxKeys` keys, each remaining subterm is represented by `TRUNCATED`."""
+    keys = []
+    stack = [term]
+    while stack:
+        term = stack.pop()
+        if maxKeys is not None and len(keys) >= maxKeys:
+            keys.append(TRUNCATED)
+        elif isinstance(term, terms.Variable):
+            keys.append(WILDCARD)
+        else:
+            keys.append((term.function_name, len(term.arguments)))
+            stack.extend(reversed(term.arguments))
+
+    return keys
+
+def arity(key):
+    return 0 if key is WILDCARD or key is TRUNCATED else key[1]
+
+class _Node(object):
+    __slots__ = ('children', 'entries')
+
+    def __init__(self):
+        self.children = {}
+        # Pairs of stored terms and their values. Only nonempty at the end of a path.
+        self.entries = []
+
+class DiscriminationTree(object):
+    """Maps terms to values and retrieves the values of stored terms that are
+    generalizations or instances of a query term. The paths of the stored terms
+    have at most about `maxKeys` keys, so inserting a term takes time
+    independent of its size."""
+
+    def __init__(self, maxKeys=64):
+        self.root = _Node()
+        self.size = 0
+        self.maxKeys = maxKeys
+
+    def __len__(self):
+        return self.size
+
+    def insert(self, term, value):
+        node = self.root
+        for key in flatten(term, self.maxKeys):
+            child = node.children.get(key)
+            if child is None:
+                child = node.children[key] = _Node()
+            node = child
+
+        node.entries.append((term, value))
+        self.size += 1
+
+    def candidates(self, term, generalizations, instances):
+        """Yield the stored entries which might be generalizations or instances of `term`.
+
+        Where the query has a function symbol and the stored term a variable, the
+        subterm of the query is skipped when looking for generalizations. Where
+        the query has a variable, any stored subterm is skipped when looking for
+        instances. The query is only traversed as far as paths in the tree follow it."""
+        # Each state consists of a node, the subterms of the query which remain to
+        # be visited as a linked list of pairs, and the number of stored subterms
+        # which still have to be skipped below the node.
+        stack = [(self.root, (term, None), 0)]
+        while stack:
+            node, remaining, skip = stack.pop()
+
+            if skip:
+                for key, child in node.children.items():
+                    stack.append((child, remaining, skip - 1 + arity(key)))
+                continue
+
+            if remaining is None:
+                yield from node.entries
+                continue
+
+            query, remaining = remaining
+            if isinstance(query, terms.Variable) and instances:
+                stack.append((node, remaining, 1))
+                continue
+
+            # A cut off subterm might be anything
+            child = node.children.get(TRUNCATED)
+            if child is not None:
+                stack.append((child, remaining, 0))
+
+            if isinstance(query, terms.Variable):
+                key = WILDCARD
+            else:
+                key = (query.function_name, len(query.arguments))
+
+            child = node.children.get(key)
+            if child is not None:
+                following = remaining
+                if key is not WILDCARD:
+                    for argument in reversed(query.arguments):
+                        following = (argument, following)
+                stack.append((child, following, 0))
+
+            if key is not WILDCARD and generalizations:
+                child = node.children.get(WILDCARD)
+                if child is not None:
+                    stack.append((child, remaining, 0))
+
+    def matches(self, term):
+        """Yield the values of stored terms which `term` is an instance of,
+        together with the substitutions turning them into `term`."""
+        for stored, value in self.candidates(term, True, False):
+            substitution = unification.match(stored, term)
+            if substitution is not None:
+                yield value, substitution
+
+    def generalizations(self, term):
+        """Yield the values of stored terms which `term` is an instance of."""
+        for value, _ in self.matches(term):
+            yield value
+
+    def instances(self, term):
+        """Yield the values of stored terms which are instances of `term`."""
+        for stored, value in self.candidates(term, False, True):
+            if unification.match(term, stored) is not None:
+                yield value
+
+    def unifiable(self, term):
+        """Yield the values of stored terms which are unifiable with `term`, together
+        with the most general unifiers. The stored terms and `term` should not
+        share any variables."""
+        for stored, value in self.candidates(term, True, True):
+            substitution = unification.unify(stored, term)
+            if substitution is not None:
+                yield value, substitution
+
+    def variants(self, term):
+        """Yield the values of stored terms which are equal to `term` up to renaming of variables."""
+        for stored, value in self.candidates(term, False, False):
+            if unification.match(stored, term) is not None and unification.match(term, stored) is not None:
+                yield value
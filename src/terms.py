@@ -1,90 +1,416 @@
-import functools
+import io
 import itertools
+import weakref
+
+# Terms are hash-consed: every structurally distinct term exists exactly once.
+# The table only references its terms weakly, so a term vanishes as soon as no
+# equation or bigger term refers to it anymore.
+_internTable = weakref.WeakValueDictionary()
+
+# The statistics of `instrumentation` while it is enabled
+statistics = None
 
 def termsEqual(term1, term2):
+    """Structurally equal terms are always the same object, because terms
+    are interned on construction. Comparing them is therefore an identity check."""
     if not isinstance(term1, Term) or not isinstance(term2, Term):
         #raise TypeError("This function is only defined for terms")
         return False
 
-    if isinstance(term1, Variable) and isinstance(term2, Variable):
-        return term1.name == term2.name
-    
-    if isinstance(term1, Application) and isinstance(term2, Application):
-        name_matches = term1.function_name == term1.function_name
-        arguments_match = all(itertools.starmap(termsEqual(t1, t2),
-                                        zip(term1.arguments, term2.arguments)))
-    
-        return name_matches and arguments_match
-    
-    return False
+    return term1 is term2
 
 class Term(object):
-    """Abstract base class for terms"""
+    """Abstract base class for terms.
+    Instances are immutable and shared, so they are usable as dictionary keys.
+    
+    `is_ground` tells whether no variables occur in the term. It is computed on
+    construction, which costs a look at each argument."""
+    
+    __slots__ = ('_hash', 'is_ground', '__weakref__')
     
     __eq__ = termsEqual
     
-    def __init(self):
-        pass
+    def __hash__(self):
+        return self._hash
     
     def variables(self):
-        raise NotImplementedError()
+        """Return the names of the variables occurring in the term as a frozenset.
+        They are collected on each call, visiting every distinct subterm once."""
+        names = set()
+        seen = set()
+        stack = [self]
+        while stack:
+            term = stack.pop()
+            if isinstance(term, Variable):
+                names.add(term.name)
+            elif not term.is_ground and term not in seen:
+                seen.add(term)
+                stack.extend(term.arguments)
+        
+        return frozenset(names)
     
-    def substitute(self, substitution):
+    def substitute(self, substitution, memo=None):
+        """Apply a substitution, a mapping from variable names to terms.
+        Subterms without any of the substituted variables are shared with the result.
+        `memo` maps subterms to their substituted versions and may be shared between
+        calls with the same substitution."""
         raise NotImplementedError()
     
     def __str__(self):
-        raise NotImplementedError()
+        out = io.StringIO()
+        writeTerm(self, out)
+        return out.getvalue()
 
 class Application(Term):
-    """A class representing function symbols applied to a number of arguments"""
-
-    def __init__(self, function_name, *arguments):
-        self.function_name = function_name
-        self.arguments = arguments
+    """A class representing function symbols applied to a number of arguments
     
-    def variables(self):
-        return functool.reduce(set.update, self.arguments, set())
+    `checked_signature` is the signature the application was last checked against,
+    and `well_formed` the result."""
+
+    __slots__ = ('function_name', 'arguments', 'checked_signature', 'well_formed')
+
+    def __new__(cls, function_name, *arguments):
+        key = (function_name, arguments)
+        term = _internTable.get(key)
+        if term is None:
+            term = object.__new__(cls)
+            term.function_name = function_name
+            term.arguments = arguments
+            term.checked_signature = None
+            term.well_formed = False
+            term.is_ground = all(argument.is_ground for argument in arguments)
+            # The arguments' hashes are already computed, so this is O(arity).
+            term._hash = hash(key)
+            _internTable[key] = term
+            if statistics is not None:
+                statistics.termsAllocated += 1
+        elif statistics is not None:
+            statistics.termsReused += 1
+        
+        return term
+
+    def substitute(self, substitution, memo=None):
+        if self.is_ground or not substitution:
+            return self
+        
+        if memo is None:
+            memo = {}
+        
+        # Each subterm with variables is visited once, bottom-up. Those in which
+        # no variable is substituted map to themselves and are shared with the
+        # result; only the others are rebuilt.
+        stack = [self]
+        while stack:
+            term = stack[-1]
+            if term in memo:
+                stack.pop()
+                continue
+            
+            if isinstance(term, Variable):
+                memo[term] = substitution.get(term.name, term)
+                stack.pop()
+                continue
+            
+            pending = [argument for argument in term.arguments
+                    if not argument.is_ground and argument not in memo]
+            if pending:
+                stack.extend(pending)
+                continue
+            
+            stack.pop()
+            arguments = [memo.get(argument, argument) for argument in term.arguments]
+            if all(new is old for new, old in zip(arguments, term.arguments)):
+                memo[term] = term
+            else:
+                memo[term] = Application(term.function_name, *arguments)
+        
+        return memo[self]
     
-    def substitute(self, substitution):
-        newArguments = map(lambda t: t.substitute(substitution), self.arguments)
-        return Application(self.function_name, *newArguments)
+    def __reduce__(self):
+        # Rebuilt through the constructor, so unpickled and copied terms are interned
+        return (Application, (self.function_name,) + self.arguments)
     
     def __str__(self):
-        if len(self.arguments) == 0:
-            return self.function_name
+        entry = _renderings.get(id(self))
+        if entry is not None and entry[0]() is self:
+            return entry[1]
         
-        return "%s(%s)" % (self.function_name, ", ".join(map(str, self.arguments)))
+        return Term.__str__(self)
 
 class Variable(Term):
     """A class representing variables in terms."""
     
-    def __init__(self, name):
-        self.name = name
+    __slots__ = ('name',)
+    
+    def __new__(cls, name):
+        key = (Variable, name)
+        term = _internTable.get(key)
+        if term is None:
+            term = object.__new__(cls)
+            term.name = name
+            term.is_ground = False
+            term._hash = hash(key)
+            _internTable[key] = term
+            if statistics is not None:
+                statistics.termsAllocated += 1
+        elif statistics is not None:
+            statistics.termsReused += 1
+        
+        return term
     
     def variables(self):
-        return self.name
+        return frozenset((self.name,))
     
-    def substitute(self, substitution):
-        if self.name in substitution:
-            return substitution[self.name]
-        
-        return Variable(self.name)
+    def substitute(self, substitution, memo=None):
+        return substitution.get(self.name, self)
+    
+    def __reduce__(self):
+        return (Variable, (self.name,))
     
     def __str__(self):
         return ":%s" % self.name
 
+# Renderings of small subterms, which are reused when writing terms containing
+# them. The table is emptied when it gets too big. It maps the ids of the terms
+# to weak references to them and the renderings, so that it doesn't keep the
+# terms alive, and an entry only counts if its term is still the one with the id.
+_renderings = {}
+_renderingsLimit = 1 << 16
+_renderingLengthLimit = 80
+
+def _rendering(term):
+    """Return the cached rendering of the term, or None."""
+    entry = _renderings.get(id(term))
+    if entry is not None and entry[0]() is term:
+        return entry[1]
+    return None
+
+def _cacheRenderings(term):
+    """Cache the renderings of the subterms which are short enough."""
+    if _rendering(term) is not None:
+        return
+    if len(_renderings) >= _renderingsLimit:
+        _renderings.clear()
+    
+    # Subterms whose renderings are too long, including all terms containing them
+    long = set()
+    stack = [term]
+    while stack:
+        term = stack[-1]
+        if term in long or _rendering(term) is not None:
+            stack.pop()
+            continue
+        
+        if isinstance(term, Variable):
+            _renderings[id(term)] = (weakref.ref(term), ":%s" % term.name)
+            stack.pop()
+            continue
+        
+        pending = [argument for argument in term.arguments if argument not in long and _rendering(argument) is None]
+        if pending:
+            stack.extend(pending)
+            continue
+        
+        stack.pop()
+        if any(argument in long for argument in term.arguments):
+            long.add(term)
+            continue
+        
+        if term.arguments:
+            rendering = "%s(%s)" % (term.function_name, ", ".join([_rendering(argument) for argument in term.arguments]))
+        else:
+            rendering = term.function_name
+        
+        if len(rendering) > _renderingLengthLimit:
+            long.add(term)
+        else:
+            _renderings[id(term)] = (weakref.ref(term), rendering)
+
+class _LengthExceeded(Exception):
+    pass
+
+def writeTerm(term, out, maxDepth=None, maxLength=None):
+    """Write the term to a text stream, without recursion. Arguments nested deeper
+    than `maxDepth` are abbreviated as "...". After `maxLength` characters, the
+    rest of the term is cut off and replaced by "...". For a binary stream, wrap
+    it into an `io.TextIOWrapper`."""
+    if maxLength is None:
+        _writeTerm(term, out.write, maxDepth)
+        return
+    
+    remaining = maxLength
+    def write(text):
+        nonlocal remaining
+        if len(text) > remaining:
+            out.write(text[:remaining])
+            raise _LengthExceeded()
+        remaining -= len(text)
+        out.write(text)
+    
+    try:
+        _writeTerm(term, write, maxDepth)
+    except _LengthExceeded:
+        out.write("...")
+
+def _writeTerm(term, write, maxDepth):
+    if maxDepth is None:
+        _cacheRenderings(term)
+    
+    stack = [(term, 0)]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            write(item)
+            continue
+        
+        term, depth = item
+        if maxDepth is None:
+            entry = _renderings.get(id(term))
+            if entry is not None and entry[0]() is term:
+                write(entry[1])
+                continue
+        elif depth >= maxDepth and isinstance(term, Application) and term.arguments:
+            write("...")
+            continue
+        
+        if isinstance(term, Variable):
+            write(":%s" % term.name)
+        elif not term.arguments:
+            write(term.function_name)
+        else:
+            write("%s(" % term.function_name)
+            stack.append(")")
+            for i in range(len(term.arguments) - 1, -1, -1):
+                stack.append((term.arguments[i], depth + 1))
+                if i:
+                    stack.append(", ")
+
+def _canonicalNames():
+    yield from 'xyzuvw'
+    for i in itertools.count(1):
+        yield 'x%d' % i
+
+def canonical(*terms_):
+    """Rename the variables of the terms to x, y, z, ... in the order of their first
+    occurrence. Terms which are equal up to renaming of variables have the same
+    canonical form."""
+    substitution = {}
+    names = _canonicalNames()
+    seen = set()
+    stack = list(reversed(terms_))
+    while stack:
+        term = stack.pop()
+        if isinstance(term, Variable):
+            if term.name not in substitution:
+                substitution[term.name] = Variable(next(names))
+        elif not term.is_ground and term not in seen:
+            seen.add(term)
+            stack.extend(reversed(term.arguments))
+    
+    memo = {}
+    return tuple(term.substitute(substitution, memo) for term in terms_)
+
+def positions(term):
+    """Yield the positions of the subterms which aren't variables, together with the subterms.
+    A position is the tuple of argument indizes on the path from the root."""
+    stack = [((), term)]
+    while stack:
+        position, term = stack.pop()
+        if isinstance(term, Application):
+            yield position, term
+            stack.extend((position + (i,), argument) for i, argument in enumerate(term.arguments))
+
+def subtermAt(term, position):
+    for i in position:
+        term = term.arguments[i]
+    
+    return term
+
+def replace(term, position, replacement):
+    """Return the term with the subterm at `position` replaced."""
+    path = []
+    for i in position:
+        path.append(term)
+        term = term.arguments[i]
+    
+    for parent, i in zip(reversed(path), reversed(position)):
+        arguments = list(parent.arguments)
+        arguments[i] = replacement
+        replacement = Application(parent.function_name, *arguments)
+    
+    return replacement
+
+class Signature(object):
+    """The arities of function symbols.
+    
+    Checking a term caches the result on each of its applications, so later checks
+    of terms sharing them only visit the applications which are new. Signatures
+    are not modified after construction, so the cached results stay valid. Only
+    the result for the signature checked last is kept, though, so a result may
+    only be read after checking against the signature again."""
+    
+    def __init__(self, arities=()):
+        self.declared = dict(arities)
+    
+    def arity(self, name):
+        """Return the arity of a function symbol, or None if it is undeclared."""
+        return self.declared.get(name)
+    
+    def check(self, term):
+        """Whether all applications in the term have the declared number of arguments."""
+        if isinstance(term, Variable):
+            return True
+        if term.checked_signature is self:
+            return term.well_formed
+        
+        declared = self.declared
+        stack = [term]
+        while stack:
+            application = stack[-1]
+            if application.checked_signature is self:
+                stack.pop()
+                continue
+            
+            pending = [argument for argument in application.arguments
+                    if isinstance(argument, Application) and argument.checked_signature is not self]
+            if pending:
+                stack.extend(pending)
+                continue
+            
+            stack.pop()
+            application.well_formed = declared.get(application.function_name) == len(application.arguments) and \
+                    all(argument.well_formed for argument in application.arguments if isinstance(argument, Application))
+            application.checked_signature = self
+        
+        return term.well_formed
+    
+    def violation(self, term):
+        """Return an application in the term with the wrong number of arguments or
+        an undeclared function symbol, or None if there is none."""
+        if self.check(term):
+            return None
+        
+        # The arguments may have been checked against another signature since
+        while True:
+            for argument in term.arguments:
+                if isinstance(argument, Application) and not self.check(argument):
+                    term = argument
+                    break
+            else:
+                return term
+
 def matchesSignature(term, signature):
     """A signature is a mapping from function symbols to their respective arities.
     An application consists of a function symbol applicated on some argument terms.
     This function checks whether all applications in a term take the right number of 
-    arguments, as determined by the ."""
+    arguments, as determined by the signature. Undeclared function symbols don't match.
+    
+    Pass a `Signature` to reuse the results of earlier checks."""
 
     if not isinstance(term, Term):
         raise TypeError("The term has to be a subclass of the class `Term`")
-
-    if isinstance(term, Application):
-        arity_right = len(term.arguments) == signature[term.function_name]
-        return arity_right and all(map(lambda t: matchesSignature(t, signature), term.arguments))
     
-    return True
-
+    if not isinstance(signature, Signature):
+        signature = Signature(signature)
+    
+    return signature.check(term)
@@ -0,0 +1,145 @@
+"""Unification and matching of terms.
+
+Substitutions are represented as dictionaries from variable names to terms,
+like `equations.employSubstitution` expects them.
+
+`unify` works on the term graph instead of substituting eagerly: equated terms are
+merged in a union-find structure, and the occurs check is done once at the end by
+looking for a cycle. Because terms are interned, shared subterms are only visited
+once, which keeps the running time almost linear even where the unifier written
+out as trees would be exponentially large."""
+
+import terms
+
+def match(pattern, term):
+    """Return the substitution turning `pattern` into `term`, or None if there is none.
+    Only the variables of `pattern` are instantiated."""
+    substitution = {}
+    seen = set()
+    pairs = [(pattern, term)]
+    while pairs:
+        pattern, term = pairs.pop()
+        if isinstance(pattern, terms.Variable):
+            bound = substitution.setdefault(pattern.name, term)
+            if bound is not term:
+                return None
+
+        elif pattern.is_ground:
+            # Only the term itself is an instance of a ground term
+            if pattern is not term:
+                return None
+
+        elif (pattern, term) not in seen:
+            if not isinstance(term, terms.Application) or \
+                    pattern.function_name != term.function_name or \
+                    len(pattern.arguments) != len(term.arguments):
+                return None
+
+            seen.add((pattern, term))
+            pairs.extend(zip(pattern.arguments, term.arguments))
+
+    return substitution
+
+def unify(term1, term2):
+    """Return a most general unifier of the terms, or None if they are not unifiable.
+    The unifier is idempotent. Variables which are only unified with each other
+    are all mapped to one of them."""
+    # Union-find forest over the subterms of both terms. Terms missing in
+    # `parent` are roots. If a class contains an application, the root is one.
+    parent = {}
+    size = {}
+
+    def find(term):
+        root = term
+        while root in parent:
+            root = parent[root]
+
+        # Path compression
+        while term is not root:
+            parent[term], term = root, parent[term]
+
+        return root
+
+    pairs = [(term1, term2)]
+    while pairs:
+        term1_, term2_ = pairs.pop()
+        if term1_ is term2_:
+            continue
+
+        # Different ground terms are never unifiable
+        if term1_.is_ground and term2_.is_ground:
+            return None
+
+        root1, root2 = find(term1_), find(term2_)
+        if root1 is root2:
+            continue
+
+        if isinstance(root1, terms.Application) and isinstance(root2, terms.Application):
+            if root1.function_name != root2.function_name or \
+                    len(root1.arguments) != len(root2.arguments):
+                return None
+
+            pairs.extend(zip(root1.arguments, root2.arguments))
+            # Union by size
+            if size.get(root1, 1) > size.get(root2, 1):
+                root1, root2 = root2, root1
+
+        elif isinstance(root2, terms.Variable):
+            # Keep an application as the root of the class
+            root1, root2 = root2, root1
+            if isinstance(root2, terms.Variable) and size.get(root1, 1) > size.get(root2, 1):
+                root1, root2 = root2, root1
+
+        parent[root1] = root2
+        size[root2] = size.get(root2, 1) + size.get(root1, 1)
+
+    # Resolve the classes bottom-up by a depth-first search. Meeting a class
+    # which is still being resolved means that a variable occurs in its own binding.
+    resolved = {}
+    resolving = set()
+    substitution = {}
+    for variable in variables(term1, term2):
+        stack = [find(variable)]
+        while stack:
+            root = stack[-1]
+            if root in resolved:
+                stack.pop()
+
+            elif isinstance(root, terms.Variable) or root.is_ground:
+                resolved[root] = root
+                stack.pop()
+
+            elif root not in resolving:
+                resolving.add(root)
+                for argument in map(find, root.arguments):
+                    if argument in resolving:
+                        return None
+                    if argument not in resolved:
+                        stack.append(argument)
+
+            else:
+                resolving.remove(root)
+                resolved[root] = terms.Application(root.function_name,
+                        *[resolved[find(argument)] for argument in root.arguments])
+                stack.pop()
+
+        value = resolved[find(variable)]
+        if value is not variable:
+            substitution[variable.name] = value
+
+    return substitution
+
+def variables(*terms_):
+    """Return the set of variables occurring in the terms."""
+    result = set()
+    seen = set()
+    stack = list(terms_)
+    while stack:
+        term = stack.pop()
+        if isinstance(term, terms.Variable):
+            result.add(term)
+        elif not term.is_ground and term not in seen:
+            seen.add(term)
+            stack.extend(term.arguments)
+
+    return result
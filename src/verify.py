@@ -0,0 +1,104 @@
+"""Check many proof scripts in parallel.
+
+Each script is run in a fresh calculator in one of a pool of worker processes.
+A script passes if none of its commands reports an error. The results are
+printed as soon as the scripts are finished, and only a bounded number of
+scripts is submitted to the pool ahead of them, so the memory used doesn't
+grow with the number of scripts."""
+
+import calculator
+
+import argparse
+import collections
+import concurrent.futures
+import glob
+import io
+import os
+import sys
+import time
+
+# `failure` is the number and the text of the first line that caused an error,
+# and the error, or None if the script passed
+Result = collections.namedtuple('Result', ('path', 'failure', 'commands', 'steps', 'seconds'))
+
+def verifyScript(path):
+    start = time.process_time()
+    calculator_ = calculator.Calculator(io.StringIO(), io.StringIO())
+    calculator_.echo = False
+    try:
+        # runScript reports exceptions of commands as errors of their lines.
+        # Undecodable bytes are replaced, so that they are reported like that, too.
+        with open(path, errors='replace') as script:
+            timings = calculator_.runScript(script)
+    except OSError as e:
+        return Result(path, (0, "", str(e)), 0, 0, time.process_time() - start)
+
+    commands = sum(count for count, _ in timings.values())
+    return Result(path, calculator_.failure, commands, len(calculator_.derivations),
+            time.process_time() - start)
+
+def findScripts(patterns):
+    """Yield the files matching the glob patterns, and those below directories."""
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for directory, subdirectories, files in os.walk(pattern):
+                subdirectories.sort()
+                for name in sorted(files):
+                    yield os.path.join(directory, name)
+        else:
+            # Directories matched by a pattern are not searched
+            yield from sorted(filter(os.path.isfile, glob.iglob(pattern, recursive=True)))
+
+def verify(paths, workers=None, window=None):
+    """Yield the results of the scripts in the order they finish. At most
+    `window` scripts are submitted, but not finished, at any time."""
+    if window is None:
+        window = 4 * (workers or os.cpu_count() or 1)
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        pending = set()
+        for path in paths:
+            if len(pending) >= window:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+            pending.add(executor.submit(verifyScript, path))
+
+        for future in concurrent.futures.as_completed(pending):
+            yield future.result()
+
+def printResult(result, file):
+    if result.failure is None:
+        print("PASS %s (%d commands, %d steps)" % (result.path, result.commands, result.steps), file=file)
+    else:
+        number, line, error = result.failure
+        print("FAIL %s:%d: %s" % (result.path, number, line), file=file)
+        print("  -- %s" % error, file=file)
+
+if __name__ == '__main__':
+    argumentParser = argparse.ArgumentParser(description="Check proof scripts in parallel")
+    argumentParser.add_argument('scripts', nargs='+', help="script files, directories containing them, or glob patterns")
+    argumentParser.add_argument('--workers', type=int, help="the number of worker processes (default: the number of processors)")
+    argumentParser.add_argument('--window', type=int, help="the maximal number of scripts submitted ahead (default: 4 per worker)")
+    argumentParser.add_argument('--failures-only', action='store_true', help="don't print the scripts which pass")
+    arguments = argumentParser.parse_args()
+
+    passed = failed = steps = 0
+    cpuSeconds = 0.0
+    start = time.perf_counter()
+    for result in verify(findScripts(arguments.scripts), arguments.workers, arguments.window):
+        if result.failure is None:
+            passed += 1
+        else:
+            failed += 1
+        steps += result.steps
+        cpuSeconds += result.seconds
+        if result.failure is not None or not arguments.failures_only:
+            printResult(result, sys.stdout)
+
+    wallSeconds = time.perf_counter() - start
+    print("%d scripts passed, %d failed, %d steps" % (passed, failed, steps))
+    print("%.3f s wall time, %.3f s CPU time in the workers (%.1fx)" % (
+            wallSeconds, cpuSeconds, cpuSeconds / wallSeconds if wallSeconds else 0.0))
+    sys.exit(1 if failed else 0)